@@ -0,0 +1,40 @@
+from os import path as os_path
+from settings import *
+from support import assets
+from timer import simulation_clock
+
+class Animation:
+    def __init__(self, frames, speed = 0, loop = True):
+        # speed is in frames per second of simulated time
+        self.frames = frames
+        self.speed = speed
+        self.loop = loop
+
+    def index(self, position):
+        # position is a point on the timeline, measured in frames
+        index = int(position)
+        if self.loop:
+            return index % len(self.frames)
+        return max(0, min(index, len(self.frames) - 1))
+
+    def frame(self, position):
+        return self.frames[self.index(position)]
+
+    def position_at(self, start = 0):
+        # Frames played since start, in milliseconds of the simulation clock
+        return (simulation_clock.time - start) * self.speed / 1000
+
+    def current_index(self, start = 0):
+        return self.index(self.position_at(start))
+
+    def current_frame(self, start = 0):
+        return self.frames[self.current_index(start)]
+
+def get_animation(path, speed = 0, loop = True):
+    # Every sprite playing the same folder at the same speed shares one Animation, kept with the frame set
+    frames = assets.frames(path)
+    animations = assets.animations.setdefault((os_path.normpath(path), False), {})
+    key = (speed, loop)
+    if key not in animations:
+        animations[key] = Animation(frames, speed, loop)
+    return animations[key]
\ No newline at end of file
@@ -0,0 +1,180 @@
+import os, sys, json, argparse, subprocess, tracemalloc
+from time import perf_counter
+
+# No window and no sound card needed
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+import numpy as np
+from settings import *
+from level import Level
+from mapgen import generate_map
+from rng import rng
+from profiler import profiler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Subsystems in the report and the profiler stage that times them
+SUBSYSTEMS = {
+    'sprites': 'sprites',
+    'crops': 'crops',
+    'plant collision': 'plant collision',
+    'rain': 'rain',
+    'sky': 'sky',
+    'camera draw': 'camera',
+    'overlay': 'overlay',
+    'tint': 'tint'}
+
+class Benchmark:
+    def __init__(self, map_path, farmed = 0.5, raining = True):
+        pygame.init()
+        pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # Python allocations are only traced while loading, tracing would skew the frame times
+        tracemalloc.start()
+        start = perf_counter()
+        self.level = Level(map_path)
+        self.load_time = perf_counter() - start
+        self.level.music.stop()
+        self.level.raining = raining
+        self.player = self.level.player
+        self.map_path = map_path
+
+        self.farm(farmed)
+        self.load_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # Time spent in each subsystem, one entry per frame
+        self.subsystems = {name: [] for name in SUBSYSTEMS}
+
+    def farm(self, farmed):
+        # Hoe, water and sow part of the farmland so the soil layer has work to do
+        soil_layer = self.level.soil_layer
+        rects = soil_layer.hit_rects
+        for index, rect in enumerate(rects[:int(len(rects) * farmed)]):
+            soil_layer.get_hit(rect.center)
+            soil_layer.water(rect.center)
+            soil_layer.plant_seed(rect.center, list(GROW_SPEED)[index % len(GROW_SPEED)])
+
+    def camera_path(self, frames):
+        # A loop around the map, half a screen in from the edges
+        world = self.level.world_rect.inflate(-SCREEN_WIDTH, -SCREEN_HEIGHT)
+        if world.width <= 0 or world.height <= 0:
+            world = pygame.Rect(self.player.rect.center, (1, 1))
+        corners = [world.topleft, world.topright, world.bottomright, world.bottomleft, world.topleft]
+        lengths = [pygame.math.Vector2(start).distance_to(end) for start, end in zip(corners, corners[1:])]
+        total = sum(lengths) or 1
+
+        for frame in range(frames):
+            distance = total * frame / frames
+            for (start, end), length in zip(zip(corners, corners[1:]), lengths):
+                if distance <= length:
+                    yield pygame.math.Vector2(start).lerp(end, distance / length if length else 0)
+                    break
+                distance -= length
+
+    def move_player(self, position):
+        self.player.position = position
+        self.player.hitbox.center = (round(position.x), round(position.y))
+        self.player.rect.center = self.player.hitbox.center
+
+    def run(self, frames):
+        # The subsystems are timed by the stages of the profiler, the ones its HUD shows
+        profiler.start_trace()
+        profiler.end_frame()
+
+        step = 1 / SIMULATION_RATE
+        frame_times = []
+        for position in self.camera_path(frames):
+            pygame.event.pump()
+            self.move_player(position)
+
+            profiler.begin_frame()
+            start = perf_counter()
+            self.level.update(step)
+            self.level.draw(1, True)
+            pygame.display.update()
+            frame_times.append(perf_counter() - start)
+            profiler.end_frame()
+
+        # A renamed stage would otherwise only show up as a subsystem that takes no time
+        trace = profiler.trace
+        missing = [stage for stage in SUBSYSTEMS.values() if not any(stage in frame for frame in trace)]
+        if missing:
+            raise ValueError(f'the level recorded no profiler stage named {", ".join(missing)}')
+        for name, stage in SUBSYSTEMS.items():
+            self.subsystems[name] = [frame.get(stage, 0) for frame in trace]
+
+        start = perf_counter()
+        self.level.reset()
+        reset_time = perf_counter() - start
+        return frame_times, reset_time
+
+    def report(self, frame_times, reset_time):
+        def summary(times):
+            times = np.array(times) * 1000
+            return {
+                'mean': float(times.mean()),
+                'p50': float(np.percentile(times, 50)),
+                'p95': float(np.percentile(times, 95)),
+                'p99': float(np.percentile(times, 99)),
+                'max': float(times.max())}
+
+        level = self.level
+        memory = {'python load peak mb': self.load_peak / 2 ** 20}
+        if resource:
+            # Linux reports kilobytes, macOS bytes
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory['max rss mb'] = max_rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+        return {
+            'version': git_version(),
+            'map': {
+                'path': self.map_path,
+                'tiles': [level.world_rect.width // TILE_SIZE, level.world_rect.height // TILE_SIZE],
+                'sprites': len(level.all_sprites),
+                'collision sprites': len(level.collision_sprites),
+                'trees': len(level.tree_sprites),
+                'farmable tiles': len(level.soil_layer.hit_rects),
+                'plants': len(level.soil_layer.crops)},
+            'frames': len(frame_times),
+            'load ms': self.load_time * 1000,
+            'frame ms': summary(frame_times),
+            'subsystem ms': {name: summary(timings) for name, timings in self.subsystems.items()},
+            'reset ms': reset_time * 1000,
+            'memory': memory}
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Load a map headless, fly the camera around it and report frame times.')
+    parser.add_argument('--map', help = 'TMX map to load, the shipped map by default')
+    parser.add_argument('--size', help = 'generate a WIDTHxHEIGHT map in tiles instead')
+    parser.add_argument('--frames', type = int, default = 600)
+    parser.add_argument('--farmed', type = float, default = 0.5, help = 'fraction of the farmland to hoe, water and sow')
+    parser.add_argument('--dry', action = 'store_true', help = 'benchmark without rain')
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--output', help = 'write the JSON report to this file')
+    args = parser.parse_args()
+
+    rng.seed(args.seed)
+    map_path = args.map or MAP_PATH
+    if args.size:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        map_path = generate_map(f'./data/generated/synthetic_{width}x{height}_{args.seed}.tmx', width, height, seed = args.seed)
+
+    benchmark = Benchmark(map_path, args.farmed, not args.dry)
+    report = benchmark.report(*benchmark.run(args.frames))
+    print(json.dumps(report, indent = 4))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent = 4)
+    pygame.quit()
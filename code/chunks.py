@@ -0,0 +1,70 @@
+import pygame
+from settings import *
+
+class ChunkLayer:
+    def __init__(self, z, chunk_size = CHUNK_SIZE):
+        self.z = z
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.baked = {}
+
+    def chunk_range(self, rect):
+        size = self.chunk_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def add(self, position, surface):
+        # Blit the surface into every chunk it overlaps
+        rect = surface.get_rect(topleft = position)
+        left, top, right, bottom = self.chunk_range(rect)
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                if (x, y) not in self.chunks:
+                    self.chunks[(x, y)] = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA).convert_alpha()
+                self.chunks[(x, y)].blit(surface, (rect.x - x * self.chunk_size, rect.y - y * self.chunk_size))
+                self.baked.pop((x, y), None)
+
+    def bake(self, key):
+        # Crop the chunk to its content and drop the alpha channel when it is fully opaque
+        chunk = self.chunks[key]
+        rect = chunk.get_bounding_rect()
+        surface = chunk.subsurface(rect).copy()
+        if pygame.mask.from_surface(surface, 254).count() == rect.width * rect.height:
+            surface = surface.convert()
+        self.baked[key] = (surface, (key[0] * self.chunk_size + rect.x, key[1] * self.chunk_size + rect.y))
+
+    def blits(self, camera_rect, alpha = 1):
+        left, top, right, bottom = self.chunk_range(camera_rect)
+        visible = []
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                if (x, y) in self.chunks:
+                    if (x, y) not in self.baked:
+                        self.bake((x, y))
+                    chunk, (chunk_x, chunk_y) = self.baked[(x, y)]
+                    visible.append((chunk, (chunk_x - camera_rect.x, chunk_y - camera_rect.y)))
+        return visible
+
+class AnimatedTileLayer:
+    def __init__(self, z, animation, chunk_size = CHUNK_SIZE):
+        # Tile positions grouped by chunk, every tile shows the same frame of the animation
+        self.z = z
+        self.animation = animation
+        self.chunk_size = chunk_size
+        self.chunks = {}
+
+    def add(self, position):
+        key = (position[0] // self.chunk_size, position[1] // self.chunk_size)
+        self.chunks.setdefault(key, []).append(position)
+
+    def blits(self, camera_rect, alpha = 1):
+        # Tiles may reach into the next chunk, so the range starts one chunk early
+        frame = self.animation.current_frame()
+        size = self.chunk_size
+        left, top = (camera_rect.left - frame.get_width()) // size, (camera_rect.top - frame.get_height()) // size
+        right, bottom = (camera_rect.right - 1) // size, (camera_rect.bottom - 1) // size
+        visible = []
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                for tile_x, tile_y in self.chunks.get((x, y), ()):
+                    visible.append((frame, (tile_x - camera_rect.x, tile_y - camera_rect.y)))
+        return visible
\ No newline at end of file
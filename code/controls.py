@@ -0,0 +1,79 @@
+import pygame
+
+# Keys the game reads, in the bit order of the recorded input masks
+GAME_KEYS = [
+    pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+    pygame.K_SPACE, pygame.K_q, pygame.K_LCTRL, pygame.K_e,
+    pygame.K_RETURN, pygame.K_ESCAPE]
+
+class KeyState:
+    def __init__(self, mask = 0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return key in GAME_KEYS and bool(self.mask & 1 << GAME_KEYS.index(key))
+
+class Controls:
+    def __init__(self):
+        self.keys = KeyState()
+        self.steps = 0
+
+        # Input masks run-length encoded as [mask, steps] pairs
+        self.recording = None
+        self.replay = None
+        self.replay_index = 0
+        self.replay_left = 0
+
+    @property
+    def replaying(self):
+        return self.replay is not None
+
+    @property
+    def finished(self):
+        return self.replaying and self.replay_index >= len(self.replay)
+
+    def start_recording(self):
+        self.recording = []
+
+    def start_replay(self, inputs):
+        self.replay = inputs
+        self.replay_index = 0
+        self.replay_left = inputs[0][1] if inputs else 0
+
+    def read_mask(self):
+        pressed = pygame.key.get_pressed()
+        mask = 0
+        for bit, key in enumerate(GAME_KEYS):
+            if pressed[key]:
+                mask |= 1 << bit
+        return mask
+
+    def next_replay_mask(self):
+        if self.finished:
+            return 0
+        mask = self.replay[self.replay_index][0]
+        self.replay_left -= 1
+        if self.replay_left == 0:
+            self.replay_index += 1
+            if self.replay_index < len(self.replay):
+                self.replay_left = self.replay[self.replay_index][1]
+        return mask
+
+    def update(self):
+        # Sampled once per simulation step, so every reader in the step sees the same keys
+        if self.replaying:
+            mask = self.next_replay_mask()
+        else:
+            mask = self.read_mask()
+            if self.recording is not None:
+                if self.recording and self.recording[-1][0] == mask:
+                    self.recording[-1][1] += 1
+                else:
+                    self.recording.append([mask, 1])
+        self.keys = KeyState(mask)
+        self.steps += 1
+
+    def get_pressed(self):
+        return self.keys
+
+controls = Controls()
\ No newline at end of file
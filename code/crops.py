@@ -0,0 +1,132 @@
+import numpy as np
+from settings import *
+
+# Crop kinds in the order of their index in the arrays
+CROP_TYPES = list(GROW_SPEED)
+
+# Per crop arrays of a CropField
+ARRAYS = ('x', 'y', 'tile', 'kind', 'age', 'grow_speed', 'max_age', 'harvestable')
+
+class CropField:
+    def __init__(self, shape, max_ages, capacity = 256):
+        # Slot of the crop on every tile of the soil grid, -1 where nothing grows
+        self.slots = np.full(shape, -1, dtype = np.int32)
+        self.width = shape[1]
+        self.count = 0
+
+        # One entry per crop, only the first count entries are in use. The grow speed and
+        # max age of the kind are copied in so a day of growth needs no lookups
+        self.x = np.zeros(capacity, dtype = np.int32)
+        self.y = np.zeros(capacity, dtype = np.int32)
+        self.tile = np.zeros(capacity, dtype = np.intp)
+        self.kind = np.zeros(capacity, dtype = np.uint8)
+        self.age = np.zeros(capacity, dtype = np.float64)
+        self.grow_speed = np.zeros(capacity, dtype = np.float64)
+        self.max_age = np.zeros(capacity, dtype = np.float64)
+        self.harvestable = np.zeros(capacity, dtype = bool)
+
+        self.kind_grow_speed = [GROW_SPEED[crop_type] for crop_type in CROP_TYPES]
+        self.kind_max_age = [max_ages[crop_type] for crop_type in CROP_TYPES]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, tile):
+        return self.slots[tile[1], tile[0]] >= 0
+
+    def grow_capacity(self):
+        capacity = len(self.x) * 2
+        for name in ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype = array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def add(self, tile, crop_type):
+        if self.count == len(self.x):
+            self.grow_capacity()
+        slot = self.count
+        kind = CROP_TYPES.index(crop_type)
+        self.x[slot], self.y[slot] = tile
+        self.tile[slot] = tile[1] * self.width + tile[0]
+        self.kind[slot] = kind
+        self.age[slot] = 0
+        self.grow_speed[slot] = self.kind_grow_speed[kind]
+        self.max_age[slot] = self.kind_max_age[kind]
+        self.harvestable[slot] = False
+        self.slots[tile[1], tile[0]] = slot
+        self.count += 1
+
+    def remove(self, tile):
+        # The last crop moves into the freed slot so the arrays stay packed
+        slot = self.slots[tile[1], tile[0]]
+        last = self.count - 1
+        if slot != last:
+            for name in ARRAYS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            self.slots[self.y[slot], self.x[slot]] = slot
+        self.slots[tile[1], tile[0]] = -1
+        self.count -= 1
+
+    def clear(self):
+        self.slots[self.y[:self.count], self.x[:self.count]] = -1
+        self.count = 0
+
+    def load(self, columns):
+        # Replaces the field with packed columns like the ones columns() returns, all at once
+        count = len(columns['x'])
+        self.clear()
+        while len(self.x) < count:
+            self.grow_capacity()
+        kind = np.asarray(columns['kind'], dtype = np.intp)
+        self.x[:count] = columns['x']
+        self.y[:count] = columns['y']
+        self.tile[:count] = self.y[:count] * self.width + self.x[:count]
+        self.kind[:count] = kind
+        self.age[:count] = columns['age']
+        self.grow_speed[:count] = np.array(self.kind_grow_speed)[kind]
+        self.max_age[:count] = np.array(self.kind_max_age)[kind]
+        self.harvestable[:count] = columns['harvestable']
+        self.slots[self.y[:count], self.x[:count]] = np.arange(count)
+        self.count = count
+
+    def get(self, tile):
+        # (crop type, age, harvestable) of the crop on a tile
+        slot = self.slots[tile[1], tile[0]]
+        return CROP_TYPES[self.kind[slot]], float(self.age[slot]), bool(self.harvestable[slot])
+
+    def grow(self, watered):
+        # One day of growth for every crop on a watered tile, watered is a boolean grid
+        count = self.count
+        age = self.age[:count]
+        max_age = self.max_age[:count]
+        growing = watered.ravel()[self.tile[:count]]
+        age += self.grow_speed[:count] * growing
+        self.harvestable[:count] |= growing & (age >= max_age)
+        np.minimum(age, max_age, out = age)
+
+    def tiles(self, selection = None):
+        # (x, y) of the crops in a selection of slots, a boolean mask or slot indices, all of them by default
+        x, y = self.x[:self.count], self.y[:self.count]
+        if selection is not None:
+            x, y = x[selection], y[selection]
+        return list(zip(x.tolist(), y.tolist()))
+
+    def harvestable_tiles(self):
+        return self.tiles(self.harvestable[:self.count])
+
+    def tiles_in(self, left, top, right, bottom):
+        # Crops on the tiles from left, top up to but not including right, bottom
+        slots = self.slots[max(0, top):max(0, bottom), max(0, left):max(0, right)]
+        return self.tiles(slots[slots >= 0])
+
+    def state(self):
+        # Packed copies of the arrays, in tile order so the result does not depend on the slots
+        count = self.count
+        order = np.lexsort((self.x[:count], self.y[:count]))
+        return {name: getattr(self, name)[:count][order] for name in ('x', 'y', 'kind', 'age', 'harvestable')}
+
+    def columns(self):
+        # Copies of the arrays in slot order, cheaper than state() when the order does not matter
+        return {name: getattr(self, name)[:self.count].copy() for name in ('x', 'y', 'kind', 'age', 'harvestable')}
\ No newline at end of file
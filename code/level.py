@@ -2,34 +2,55 @@ import pygame
 from settings import *
 from player import Player
 from overlay import Overlay
-from sprites import Generic, Water, WildFlower, Tree, Interaction, Particle
-from pytmx.util_pygame import load_pygame
+from sprites import Generic, WildFlower, Tree, Interaction, Particle, CollisionGroup, InteractionGroup
+from tilemap import load_map
 from support import *
 from transition import Transition
 from soil import SoilLayer
 from sky import Rain, Sky
-from random import randint
+from itertools import count
+from collections import Counter
 from menu import Menu
+from spatial import SpatialHash
+from chunks import ChunkLayer, AnimatedTileLayer
+from animation import get_animation
+from timer import simulation_clock, scheduler
+from profiler import profiler
+from rng import rng
+from controls import controls
+from save import autosaver
 
 class Level:
-    def __init__(self):
+    def __init__(self, map_path = MAP_PATH, save_path = None):
         # get the display surface
         self.display_surface = pygame.display.get_surface()
+        self.map_path = map_path
+
+        # Every new day is saved here in the background, nothing is saved without it
+        self.save_path = save_path
+
+        # Events of a previous level would act on its sprites
+        scheduler.clear()
 
         # sprite group
         self.all_sprites = CameraGroup()
-        self.collision_sprites = pygame.sprite.Group()
-        self.tree_sprites = pygame.sprite.Group()
-        self.interaction_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionGroup()
+        self.tree_sprites = InteractionGroup()
+        self.interaction_sprites = InteractionGroup()
 
-        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites)
+        self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites, map_path)
+        self.all_sprites.add_renderer(LAYERS['soil water'], self.soil_layer.water_layer)
         self.setup()
+
+        # Screen sized area around the player, crops inside it get sprites
+        self.view_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
         self.overlay = Overlay(self.player)
         self.transition = Transition(self.reset, self.player)
 
         # Sky
-        self.rain = Rain(self.all_sprites)
-        self.raining = randint(0, 10) > 3
+        self.rain = Rain(self.all_sprites, self.world_rect)
+        self.raining = rng.randint(0, 10) > 3
         self.soil_layer.raining = self.raining
         self.sky = Sky()
 
@@ -37,21 +58,33 @@ class Level:
         self.menu = Menu(self.player, self.toggle_shop)
         self.shop_active = False
 
+        # What was drawn over the whole screen last frame
+        self.screen_state = None
+
         # Music
-        self.success = pygame.mixer.Sound('./audio/success.wav')
+        self.success = load_sound('./audio/success.wav')
         self.success.set_volume(0.3)
 
-        self.music = pygame.mixer.Sound('./audio/music.mp3')
+        self.music = load_sound('./audio/music.mp3')
         self.music.set_volume(0.1)
         self.music.play(loops = -1)
 
+        # Sprite counts shown by the profiler
+        profiler.watch_groups({
+            'all': self.all_sprites,
+            'collision': self.collision_sprites,
+            'trees': self.tree_sprites,
+            'soil': self.soil_layer.soil_sprites,
+            'plants': self.soil_layer.plant_sprites})
+
     def setup(self):
-        tmx_data = load_pygame('./data/map.tmx')
+        tmx_data = load_map(self.map_path)
+        self.world_rect = pygame.Rect(0, 0, tmx_data.width * TILE_SIZE, tmx_data.height * TILE_SIZE)
 
         # House import
         for layer in ['HouseFloor', 'HouseFurnitureBottom']:
             for x, y, surface in tmx_data.get_layer_by_name(layer).tiles():
-                Generic((x * TILE_SIZE, y * TILE_SIZE), surface, self.all_sprites, LAYERS['house bottom'])
+                self.all_sprites.add_static((x * TILE_SIZE, y * TILE_SIZE), surface, LAYERS['house bottom'])
 
         for layer in ['HouseWalls', 'HouseFurnitureTop']:
             for x, y, surface in tmx_data.get_layer_by_name(layer).tiles():
@@ -61,10 +94,10 @@ class Level:
         for x, y, surface in tmx_data.get_layer_by_name('Fence').tiles():
             Generic((x * TILE_SIZE, y * TILE_SIZE), surface, [self.all_sprites, self.collision_sprites])
 
-        # Water import
-        water_frames = import_folder('./graphics/water')
+        # Water import, every tile plays the same frame
+        water = get_animation('./graphics/water', 5)
         for x, y, surface in tmx_data.get_layer_by_name('Water').tiles():
-            Water((x * TILE_SIZE, y * TILE_SIZE), water_frames, self.all_sprites)
+            self.all_sprites.add_animated((x * TILE_SIZE, y * TILE_SIZE), water, LAYERS['water'])
 
         # Tree import
         for obj in tmx_data.get_layer_by_name('Trees'):
@@ -101,11 +134,14 @@ class Level:
             if obj.name == 'Trader':
                 Interaction((obj.x, obj.y), (obj.width, obj.height), self.interaction_sprites, obj.name)
 
-        Generic(
-            position = (0,0),
-            surface = pygame.image.load('./graphics/world/ground.png').convert_alpha(),
-            groups = self.all_sprites,
-            z = LAYERS['ground'])
+        # Ground, repeated when the map is larger than the image
+        ground = load_image('./graphics/world/ground.png')
+        for y in range(0, self.world_rect.height, ground.get_height()):
+            for x in range(0, self.world_rect.width, ground.get_width()):
+                self.all_sprites.add_static(
+                    position = (x,y),
+                    surface = ground,
+                    z = LAYERS['ground'])
         
     def player_add(self, item):
         
@@ -122,7 +158,7 @@ class Level:
         
         # Soil
         self.soil_layer.remove_water()
-        self.raining = randint(0, 10) > 3
+        self.raining = rng.randint(0, 10) > 3
         self.soil_layer.raining = self.raining
         if self.raining:
             self.soil_layer.water_all()
@@ -134,53 +170,295 @@ class Level:
             tree.create_fruits()
 
         # Sky
-        self.sky.start_color = [255, 255, 255]
+        self.sky.reset()
+
+        # Autosave
+        if self.save_path:
+            autosaver.save(self, self.save_path)
     
     def plant_collision(self):
-        if self.soil_layer.plant_sprites:
-            for plant in self.soil_layer.plant_sprites.sprites():
-                if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
-                    self.player_add(plant.plant_type)
-                    plant.kill()
-                    Particle(plant.rect.topleft, plant.image, self.all_sprites, z = LAYERS['main'])
-                    self.soil_layer.grid[plant.rect.centery // TILE_SIZE][plant.rect.centerx // TILE_SIZE].remove('P')
+        for plant in self.soil_layer.harvestable_sprites.colliding(self.player.hitbox):
+            self.player_add(plant.plant_type)
+            self.soil_layer.remove_plant(plant)
+            Particle(plant.rect.topleft, plant.image, self.all_sprites, z = LAYERS['main'])
 
-    def run(self, dt):
-        
-        # Drawing logic
-        self.display_surface.fill('black')
-        self.all_sprites.custom_draw(self.player)
+    def update(self, dt):
+        simulation_clock.advance(dt)
+        scheduler.update()
+        controls.update()
 
         # Update logic
         if self.shop_active:
-            self.menu.update()
+            with profiler.stage('menu'):
+                self.menu.update()
+
+            # Nothing moves while the shop is open, the sprites are drawn where they are instead of
+            # between the positions of the last step before it opened
+            self.all_sprites.previous_positions.clear()
         else:
-            self.all_sprites.update(dt)
-            self.plant_collision()
+            with profiler.stage('sprites'):
+                self.all_sprites.update(dt)
+            with profiler.stage('crops'):
+                self.view_rect.center = self.player.rect.center
+                self.soil_layer.update_visible(self.view_rect)
+            with profiler.stage('plant collision'):
+                self.plant_collision()
 
         # Weather
-        self.overlay.display()
-        if self.raining and not self.shop_active:
-            self.rain.update()
-        self.sky.display(dt)
-        
+        with profiler.stage('rain'):
+            if not self.shop_active:
+                self.rain.update(dt, self.raining)
+        with profiler.stage('sky'):
+            self.sky.update(dt)
+
         # Transition overlay
         if self.player.sleep:
-            self.transition.play()
+            with profiler.stage('transition'):
+                self.transition.update()
+
+    def draw(self, alpha = 1, full_redraw = False):
+        # alpha is how far the frame lies between the last two update steps. Returns the rects of the
+        # screen that changed, or None when all of it was drawn again
+
+        # Anything covering the whole screen forces a full redraw while it is shown and once after
+        screen_state = (full_redraw, self.shop_active, self.player.sleep, self.player.selected_tool, self.player.selected_seed, self.sky.current_color())
+        if not DIRTY_RECTS or full_redraw or self.shop_active or self.player.sleep or screen_state != self.screen_state:
+            full_redraw = True
+        self.screen_state = screen_state
+
+        # Drawing logic
+        with profiler.stage('camera'):
+            rects = self.all_sprites.custom_draw(self.player, alpha, full_redraw, self.draw_over)
+        if rects is not None:
+            return rects
+
+        if self.shop_active:
+            with profiler.stage('menu'):
+                self.menu.display()
+
+        # Weather
+        with profiler.stage('overlay'):
+            self.overlay.display()
+        with profiler.stage('tint'):
+            self.sky.display()
+
+        # Transition overlay
+        if self.player.sleep:
+            with profiler.stage('transition'):
+                self.transition.display()
+        return None
+
+    def draw_over(self):
+        # What covers the sprites when only parts of the screen are redrawn
+        self.overlay.display()
+        self.sky.display()
+
+    def run(self, dt):
+        self.update(dt)
+        self.draw()
 
 class CameraGroup(pygame.sprite.Group):
     def __init__(self):
         super().__init__()
         self.display_surface = pygame.display.get_surface()
         self.offset = pygame.math.Vector2()
-        
-    def custom_draw(self, player):
-        self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
-        self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
-
-        for layer in LAYERS.values():
-            for sprite in sorted(self.sprites(), key = lambda sprite: sprite.rect.centery):
-                if sprite.z == layer:
-                    offset_rect = sprite.rect.copy()
-                    offset_rect.center -= self.offset
-                    self.display_surface.blit(sprite.image, offset_rect)
\ No newline at end of file
+        self.camera_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+        # Render queue: sprites are indexed by position and sorted by a cached depth
+        self.sprite_index = SpatialHash()
+        self.sprite_rects = {}
+        self.sprite_depths = {}
+        self.sprite_layers = {}
+        self.sprite_order = {}
+        self.new_sprites = {}
+        self.order_counter = count()
+
+        # Sorted sprites of the static layers, reused while the camera covers the same cells and none of them changed
+        self.static_version = 0
+        self.static_key = None
+        self.static_layers = {}
+
+        # Immutable layers baked into chunk surfaces and other batched renderers
+        self.chunk_layers = {}
+        self.animated_layers = {}
+        self.renderers = {}
+
+        # Positions before the last update step, for the sprites that moved during it
+        self.previous_positions = {}
+
+        # Camera position and blits of the last frame, to find what changed since
+        self.last_frame = None
+
+        # Culling stats of the last frame
+        self.stats = {'candidates': 0, 'drawn': 0, 'culled': 0, 'batched': 0, 'dirty': 0}
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        # Sprites are added before their image, rect and z exist, so they are only queued here
+        self.sprite_order[sprite] = next(self.order_counter)
+        self.new_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.sprite_order[sprite]
+        self.previous_positions.pop(sprite, None)
+        if sprite in self.sprite_index:
+            self.sprite_index.remove(sprite)
+            del self.sprite_rects[sprite]
+            del self.sprite_depths[sprite]
+            if self.sprite_layers.pop(sprite) not in Y_SORT_LAYERS:
+                self.static_version += 1
+        else:
+            del self.new_sprites[sprite]
+
+    def add_static(self, position, surface, z):
+        if z not in self.chunk_layers:
+            self.chunk_layers[z] = ChunkLayer(z)
+            self.add_renderer(z, self.chunk_layers[z])
+        self.chunk_layers[z].add(position, surface)
+
+    def add_animated(self, position, animation, z):
+        if (z, animation) not in self.animated_layers:
+            self.animated_layers[(z, animation)] = AnimatedTileLayer(z, animation)
+            self.add_renderer(z, self.animated_layers[(z, animation)])
+        self.animated_layers[(z, animation)].add(position)
+
+    def add_renderer(self, z, renderer):
+        # Renderers hand over all their blits at once, drawn before the sprites of their layer
+        self.renderers.setdefault(z, []).append(renderer)
+
+    def index_sprite(self, sprite):
+        self.sprite_rects[sprite] = sprite.rect.copy()
+        self.sprite_depths[sprite] = (sprite.rect.centery, self.sprite_order[sprite])
+        previous_layer = self.sprite_layers.get(sprite)
+        self.sprite_layers[sprite] = sprite.z
+        if sprite.z not in Y_SORT_LAYERS or (previous_layer is not None and previous_layer not in Y_SORT_LAYERS):
+            self.static_version += 1
+        if sprite in self.sprite_index:
+            self.sprite_index.move(sprite, sprite.rect)
+        else:
+            self.sprite_index.insert(sprite, sprite.rect)
+
+    def update(self, dt):
+        # Sprites move in their update, so the index is refreshed right after it
+        self.previous_positions.clear()
+        for sprite in self.sprites():
+            previous_rect = sprite.rect.copy()
+            sprite.update(dt)
+            if sprite in self.sprite_rects and sprite.rect != self.sprite_rects[sprite]:
+                self.index_sprite(sprite)
+
+            # Only plain movement is interpolated, a new image size snaps into place
+            if sprite.rect != previous_rect and sprite.rect.size == previous_rect.size and sprite in self.sprite_order:
+                self.previous_positions[sprite] = previous_rect.topleft
+
+    def interpolate(self, sprite, alpha):
+        x, y = sprite.rect.topleft
+        if alpha < 1 and sprite in self.previous_positions:
+            previous_x, previous_y = self.previous_positions[sprite]
+            x = round(previous_x + (x - previous_x) * alpha)
+            y = round(previous_y + (y - previous_y) * alpha)
+        return x, y
+
+    def dirty_rects(self, previous_blits, blits):
+        # Blits that appeared or went away since the last frame, None when a full redraw is cheaper
+        changes = Counter(previous_blits)
+        changes.subtract(blits)
+        screen_rect = self.display_surface.get_rect()
+        rects = {}
+        for (surface, position), amount in changes.items():
+            if amount:
+                # A surface replaced by another one at the same place only needs one redraw
+                rect = surface.get_rect(topleft = position).clip(screen_rect)
+                if rect:
+                    rects[tuple(rect)] = rect
+        area = sum(rect.width * rect.height for rect in rects.values())
+        if area > screen_rect.width * screen_rect.height * DIRTY_RECT_LIMIT:
+            return None
+        return list(rects.values())
+
+    def redraw(self, blits, rects, draw_over):
+        # Every dirty rect is cleared and drawn again from scratch, so overlapping rects stay correct
+        blit_rects = [surface.get_rect(topleft = position) for surface, position in blits]
+        for rect in rects:
+            self.display_surface.set_clip(rect)
+            self.display_surface.fill('black')
+            self.display_surface.blits([blits[index] for index in rect.collidelistall(blit_rects)], doreturn = False)
+            if draw_over:
+                draw_over()
+        self.display_surface.set_clip(None)
+
+    def custom_draw(self, player, alpha = 1, full_redraw = True, draw_over = None):
+        # Returns the rects that were redrawn, or None when the whole screen was. draw_over draws
+        # whatever covers the sprites and is called again inside every redrawn rect
+        player_x, player_y = self.interpolate(player, alpha)
+        self.offset.x = player_x + player.rect.width // 2 - SCREEN_WIDTH / 2
+        self.offset.y = player_y + player.rect.height // 2 - SCREEN_HEIGHT / 2
+        offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+        self.camera_rect.topleft = (offset_x, offset_y)
+
+        for sprite in self.new_sprites:
+            self.index_sprite(sprite)
+        self.new_sprites.clear()
+
+        # Only the sprites overlapping the camera are drawn
+        static_version = self.static_version
+        candidates = self.sprite_index.query(self.camera_rect)
+        for sprite in candidates:
+            if sprite.rect != self.sprite_rects[sprite] or sprite.z != self.sprite_layers[sprite]:
+                self.index_sprite(sprite)
+        if self.static_version != static_version:
+            candidates = self.sprite_index.query(self.camera_rect)
+
+        # Static layers are only sorted again when the camera reaches other cells or one of their sprites changed
+        static_key = (self.sprite_index.cell_range(self.camera_rect), self.static_version)
+        if static_key != self.static_key:
+            self.static_key = static_key
+            self.static_layers = {layer: [] for layer in LAYERS.values() if layer not in Y_SORT_LAYERS}
+            for sprite in candidates:
+                if sprite.z in self.static_layers:
+                    self.static_layers[sprite.z].append(sprite)
+            for sprites in self.static_layers.values():
+                sprites.sort(key = self.sprite_depths.__getitem__)
+
+        layers = {layer: [] for layer in LAYERS.values()}
+        for sprite in candidates:
+            if sprite.z in Y_SORT_LAYERS and sprite.rect.colliderect(self.camera_rect):
+                layers[sprite.z].append(sprite)
+        for layer, sprites in self.static_layers.items():
+            layers[layer] = [sprite for sprite in sprites if sprite.rect.colliderect(self.camera_rect)]
+
+        # Everything on screen this frame, in drawing order
+        blits = []
+        batched = 0
+        for layer, sprites in layers.items():
+            for renderer in self.renderers.get(layer, ()):
+                renderer_blits = renderer.blits(self.camera_rect, alpha)
+                blits.extend(renderer_blits)
+                batched += len(renderer_blits)
+            if layer in Y_SORT_LAYERS:
+                sprites.sort(key = self.sprite_depths.__getitem__)
+            for sprite in sprites:
+                x, y = self.interpolate(sprite, alpha)
+                blits.append((sprite.image, (x - offset_x, y - offset_y)))
+
+        drawn = len(blits) - batched
+        self.stats['candidates'] = len(candidates)
+        self.stats['drawn'] = drawn
+        self.stats['culled'] = len(self) - drawn
+        self.stats['batched'] = batched
+
+        # While the camera stands still only the blits that changed are drawn again
+        last_frame = self.last_frame
+        self.last_frame = (self.camera_rect.topleft, blits)
+        if not full_redraw and last_frame and last_frame[0] == self.camera_rect.topleft:
+            rects = self.dirty_rects(last_frame[1], blits)
+            if rects is not None:
+                self.redraw(blits, rects, draw_over)
+                self.stats['dirty'] = len(rects)
+                return rects
+
+        self.display_surface.fill('black')
+        self.display_surface.blits(blits, doreturn = False)
+        self.stats['dirty'] = None
+        return None
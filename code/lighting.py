@@ -0,0 +1,28 @@
+import pygame
+from math import ceil
+from settings import *
+
+class TintLayer:
+    def __init__(self, step = TINT_STEP):
+        self.display_surface = pygame.display.get_surface()
+        self.surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.step = step
+        self.color = None
+
+    def quantize(self, color):
+        # Steps count down from white, so white stays an exact step
+        return tuple(max(0, 255 - ceil((255 - value) / self.step) * self.step) for value in color)
+
+    def draw(self, color):
+        color = self.quantize(color)
+
+        # A white tint would not change anything
+        if color == (255, 255, 255):
+            return False
+
+        # Only refill the surface when the quantized colour moved
+        if color != self.color:
+            self.surface.fill(color)
+            self.color = color
+        self.display_surface.blit(self.surface, (0, 0), special_flags = pygame.BLEND_RGBA_MULT)
+        return True
\ No newline at end of file
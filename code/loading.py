@@ -0,0 +1,43 @@
+import pygame, sys
+from settings import *
+from support import AssetLoader, assets, text_cache
+from tilemap import atlas_path
+
+class LoadingScreen:
+    def __init__(self, map_path = MAP_PATH):
+        self.display_surface = pygame.display.get_surface()
+        self.font = text_cache.font('./font/LycheeSoda.ttf', 30)
+        self.clock = pygame.time.Clock()
+
+        # The atlas of the map is only there once its cache was built, the loader skips it otherwise
+        self.loader = AssetLoader(assets, PRELOAD_IMAGES + [atlas_path(map_path)], PRELOAD_SOUNDS)
+
+        # progress bar
+        self.bar_rect = pygame.Rect(0, 0, 400, 24)
+        self.bar_rect.center = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+
+    def draw(self):
+        self.display_surface.fill('black')
+
+        text_surface = text_cache.render(self.font, f'Loading {int(self.loader.progress * 100)}%', 'White')
+        text_rect = text_surface.get_rect(midbottom = self.bar_rect.midtop - pygame.math.Vector2(0, 10))
+        self.display_surface.blit(text_surface, text_rect)
+
+        fill_rect = self.bar_rect.copy()
+        fill_rect.width = self.bar_rect.width * self.loader.progress
+        pygame.draw.rect(self.display_surface, 'White', fill_rect, 0, 6)
+        pygame.draw.rect(self.display_surface, 'White', self.bar_rect, 2, 6)
+
+    def run(self):
+        self.loader.start()
+        while not self.loader.done:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+
+            self.loader.update()
+            self.draw()
+            pygame.display.update()
+            self.clock.tick(60)
+        return self.loader
\ No newline at end of file
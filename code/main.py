@@ -1,26 +1,84 @@
-import pygame, sys
+import pygame, sys, os, argparse
 from settings import *
 from level import Level
+from loading import LoadingScreen
+from support import assets
+from profiler import profiler
+from rng import rng
+from controls import controls
+from replay import save_recording
+from save import load_game, autosaver
 
 class Game:
-    def __init__(self):
+    def __init__(self, record = None, seed = None, save_path = SAVE_PATH, new_game = False, map_path = MAP_PATH, timings = False):
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED if VSYNC else 0, vsync = VSYNC)
         pygame.display.set_caption('Sprout Land')
         self.clock = pygame.time.Clock()
-        self.level = Level()
+        LoadingScreen(map_path).run()
+        if timings:
+            print('\n'.join(assets.report()))
+
+        # Seeded before the level exists, it already rolls the weather and the apples
+        rng.seed(seed)
+        self.record = record
+        if record:
+            controls.start_recording()
+        self.level = Level(map_path, save_path)
+
+        # A recording replays from a new game, so it never starts from a save
+        if save_path and not new_game and not record and os.path.exists(save_path):
+            try:
+                load_game(self.level, save_path)
+            except ValueError as error:
+                print(f'{error}, starting a new game')
+        if PROFILER_TRACE:
+            profiler.start_trace()
 
     def run(self):
+        step = 1 / SIMULATION_RATE
+        accumulator = 0
+        self.clock.tick()
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    if self.record:
+                        save_recording(self.record, self.level, self.level.map_path)
+                    if profiler.tracing:
+                        profiler.export(PROFILER_TRACE)
+                    autosaver.shutdown()
                     pygame.quit()
                     sys.exit()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle()
 
-            dt = self.clock.tick() / 1000
-            self.level.run(dt)
-            pygame.display.update()
+            # The simulation always advances in fixed steps, whatever the frame rate
+            accumulator += min(self.clock.tick(MAX_FPS) / 1000, MAX_FRAME_TIME)
+            profiler.begin_frame()
+            with profiler.stage('update'):
+                while accumulator >= step:
+                    self.level.update(step)
+                    accumulator -= step
+
+            # The profiler HUD is drawn over the level, so the level is drawn in full while it is shown
+            with profiler.stage('draw'):
+                rects = self.level.draw(accumulator / step, profiler.visible)
+            profiler.display()
+            if rects is None:
+                pygame.display.update()
+            else:
+                pygame.display.update(rects)
+            profiler.end_frame()
 
 if __name__ == '__main__':
-    game = Game()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', help = 'record the session to this file, replay it with replay.py')
+    parser.add_argument('--seed', type = int, default = None)
+    parser.add_argument('--map', default = MAP_PATH, help = 'TMX map to play on')
+    parser.add_argument('--timings', action = 'store_true', help = 'print how long every preloaded asset took to load')
+    parser.add_argument('--save', default = SAVE_PATH, help = 'save file, loaded on launch and written every new day')
+    parser.add_argument('--new', action = 'store_true', help = 'ignore the save file and start a new game')
+    args = parser.parse_args()
+
+    game = Game(args.record, args.seed, args.save, args.new, args.map, args.timings)
     game.run()
\ No newline at end of file
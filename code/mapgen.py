@@ -0,0 +1,172 @@
+import os, argparse
+from random import Random
+from settings import *
+
+# Same tilesets and first gids as data/map.tmx
+TILESETS = [
+    (1, 'Grass.tsx'),
+    (81, 'Hills.tsx'),
+    (117, 'Fences.tsx'),
+    (133, 'Plant Decoration.tsx'),
+    (143, 'Objects.tsx'),
+    (153, 'Paths.tsx'),
+    (169, 'interaction.tsx'),
+    (171, 'Water.tsx'),
+    (172, 'House.tsx'),
+    (207, 'House Decoration.tsx')]
+TILESET_FOLDER = './data/Tilesets'
+
+# Gids and object sizes used by the shipped map
+WATER_GID = 171
+FARMABLE_GID = 169
+COLLISION_GID = 170
+FENCE_GIDS = [121, 131]
+TREES = {'Large': (148, 96, 124), 'Small': (149, 56, 116)}
+DECORATIONS = [(143, 64, 60), (147, 56, 112), (150, 44, 48), (151, 40, 44), (152, 52, 52)]
+
+# Fraction of the tiles covered by each feature
+DENSITIES = {
+    'farmable': 0.08,
+    'water': 0.03,
+    'fence': 0.02,
+    'collision': 0.02,
+    'trees': 0.02,
+    'decoration': 0.03}
+
+class MapGenerator:
+    def __init__(self, width, height, densities = None, seed = None):
+        self.width = width
+        self.height = height
+        self.densities = dict(DENSITIES, **(densities or {}))
+        self.random = Random(seed)
+
+        self.layers = {name: [[0] * width for _ in range(height)] for name in ('Water', 'Fence', 'Collision', 'Farmable')}
+        self.trees = []
+        self.decorations = []
+
+        # Tiles around the start are kept clear so the player is never stuck
+        self.start = (width // 2, height // 2)
+        self.used = {(self.start[0] + x, self.start[1] + y) for x in range(-2, 3) for y in range(-2, 3)}
+
+    def amount(self, feature):
+        return int(self.width * self.height * self.densities[feature])
+
+    def free_tile(self):
+        for _ in range(100):
+            tile = (self.random.randrange(self.width), self.random.randrange(self.height))
+            if tile not in self.used:
+                self.used.add(tile)
+                return tile
+
+    def place_fields(self):
+        # Farmland comes in rectangular fields, like the farm on the shipped map
+        remaining = self.amount('farmable')
+        while remaining > 0:
+            field_width = self.random.randint(3, 8)
+            field_height = self.random.randint(3, 6)
+            left = self.random.randrange(max(1, self.width - field_width))
+            top = self.random.randrange(max(1, self.height - field_height))
+            tiles = {(x, y) for x in range(left, min(left + field_width, self.width)) for y in range(top, min(top + field_height, self.height))}
+            if tiles & self.used:
+                remaining -= 1
+                continue
+            for x, y in tiles:
+                self.layers['Farmable'][y][x] = FARMABLE_GID
+            self.used |= tiles
+            remaining -= len(tiles)
+
+    def place_tiles(self, layer, feature, gids):
+        for _ in range(self.amount(feature)):
+            tile = self.free_tile()
+            if tile:
+                x, y = tile
+                self.layers[layer][y][x] = self.random.choice(gids)
+
+                # Water and fences block the player like on the shipped map
+                if layer in ('Water', 'Fence'):
+                    self.layers['Collision'][y][x] = COLLISION_GID
+
+    def place_objects(self, objects, feature, kinds):
+        for _ in range(self.amount(feature)):
+            tile = self.free_tile()
+            if tile:
+                name, (gid, width, height) = self.random.choice(kinds)
+                x = tile[0] * TILE_SIZE + self.random.randint(0, max(0, TILE_SIZE - width))
+                y = (tile[1] + 1) * TILE_SIZE
+                objects.append((name, gid, x, y, width, height))
+
+    def generate(self):
+        self.place_fields()
+        self.place_tiles('Water', 'water', [WATER_GID])
+        self.place_tiles('Fence', 'fence', FENCE_GIDS)
+        self.place_tiles('Collision', 'collision', [COLLISION_GID])
+        self.place_objects(self.trees, 'trees', list(TREES.items()))
+        self.place_objects(self.decorations, 'decoration', [(None, decoration) for decoration in DECORATIONS])
+        return self
+
+    def tile_layer(self, layer_id, name, rows, visible = True):
+        data = ',\n'.join(','.join(str(gid) for gid in row) for row in rows)
+        visibility = '' if visible else ' visible="0"'
+        return (
+            f' <layer id="{layer_id}" name="{name}" width="{self.width}" height="{self.height}"{visibility}>\n'
+            f'  <data encoding="csv">\n{data}\n</data>\n'
+            f' </layer>\n')
+
+    def object_group(self, group_id, name, objects, first_id):
+        lines = [f' <objectgroup id="{group_id}" name="{name}">\n']
+        for index, (object_name, gid, x, y, width, height) in enumerate(objects):
+            name_attribute = f' name="{object_name}"' if object_name else ''
+            lines.append(f'  <object id="{first_id + index}"{name_attribute} gid="{gid}" x="{x}" y="{y}" width="{width}" height="{height}"/>\n')
+        lines.append(' </objectgroup>\n')
+        return ''.join(lines)
+
+    def write(self, path):
+        folder = os.path.dirname(os.path.abspath(path))
+        tileset_folder = os.path.relpath(os.path.abspath(TILESET_FOLDER), folder)
+        empty = [[0] * self.width for _ in range(self.height)]
+        start_x, start_y = self.start[0] * TILE_SIZE + TILE_SIZE // 2, self.start[1] * TILE_SIZE + TILE_SIZE // 2
+
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            f'<map version="1.8" tiledversion="1.8.6" orientation="orthogonal" renderorder="right-down" width="{self.width}" height="{self.height}" tilewidth="{TILE_SIZE}" tileheight="{TILE_SIZE}" infinite="0" nextlayerid="19" nextobjectid="{len(self.trees) + len(self.decorations) + 4}">\n']
+        for firstgid, source in TILESETS:
+            parts.append(f' <tileset firstgid="{firstgid}" source="{tileset_folder}/{source}"/>\n')
+
+        # Every layer the level reads, the house layers stay empty
+        parts.append(self.tile_layer(2, 'Water', self.layers['Water'], visible = False))
+        parts.append(self.tile_layer(4, 'Fence', self.layers['Fence']))
+        for layer_id, name in ((16, 'HouseFloor'), (15, 'HouseWalls'), (18, 'HouseFurnitureBottom'), (17, 'HouseFurnitureTop')):
+            parts.append(self.tile_layer(layer_id, name, empty))
+        parts.append(self.object_group(9, 'Trees', self.trees, 4))
+        parts.append(self.object_group(10, 'Decoration', self.decorations, 4 + len(self.trees)))
+        parts.append(
+            ' <objectgroup id="12" name="Player">\n'
+            f'  <object id="1" name="Start" x="{start_x}" y="{start_y}">\n'
+            '   <point/>\n'
+            '  </object>\n'
+            f'  <object id="2" name="Trader" x="{start_x - 2 * TILE_SIZE}" y="{start_y - 2 * TILE_SIZE}" width="{TILE_SIZE}" height="{TILE_SIZE}"/>\n'
+            f'  <object id="3" name="Bed" x="{start_x + TILE_SIZE}" y="{start_y - 2 * TILE_SIZE}" width="{TILE_SIZE}" height="{TILE_SIZE}"/>\n'
+            ' </objectgroup>\n')
+        parts.append(self.tile_layer(14, 'Collision', self.layers['Collision'], visible = False))
+        parts.append(self.tile_layer(13, 'Farmable', self.layers['Farmable'], visible = False))
+        parts.append('</map>\n')
+
+        os.makedirs(folder, exist_ok = True)
+        with open(path, 'w') as file:
+            file.write(''.join(parts))
+        return path
+
+def generate_map(path, width, height, densities = None, seed = None):
+    return MapGenerator(width, height, densities, seed).generate().write(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Write a synthetic TMX map with the layers the level reads.')
+    parser.add_argument('path')
+    parser.add_argument('--width', type = int, default = 200)
+    parser.add_argument('--height', type = int, default = 200)
+    parser.add_argument('--seed', type = int, default = None)
+    for feature, density in DENSITIES.items():
+        parser.add_argument(f'--{feature}', type = float, default = density, help = f'fraction of tiles, {density} by default')
+    args = parser.parse_args()
+
+    generate_map(args.path, args.width, args.height, {feature: getattr(args, feature) for feature in DENSITIES}, args.seed)
@@ -1,6 +1,11 @@
 import pygame
 from settings import *
 from timer import Timer
+from controls import controls
+from support import text_cache
+
+# Never drawn by the menu, marks the transparent parts of the panel
+PANEL_COLORKEY = (255, 0, 255)
 
 class Menu:
     def __init__(self, player, toggle_menu):
@@ -9,7 +14,7 @@ class Menu:
         self.player = player
         self.toggle_menu = toggle_menu
         self.display_surface = pygame.display.get_surface()
-        self.font = pygame.font.Font('./font/LycheeSoda.ttf', 30)
+        self.font = text_cache.font('./font/LycheeSoda.ttf', 30)
 
         # Menu dimensions
         self.width = 400
@@ -25,12 +30,20 @@ class Menu:
         self.index = 0
         self.timer = Timer(200)
 
-    def display_money(self):
-        text_surface = self.font.render(f'${self.player.money}', False, 'Black')
-        text_rect = text_surface.get_rect(midbottom =  (SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20))
+        # The panel is drawn once into this surface and redrawn only when what it shows changes
+        self.panel = None
+        self.panel_rect = None
+        self.panel_state = None
+
+    def get_state(self):
+        return (self.index, self.player.money, tuple(self.player.item_inventory.values()), tuple(self.player.seed_inventory.values()))
+
+    def display_money(self, surface, origin):
+        text_surface = text_cache.render(self.font, f'${self.player.money}', 'Black')
+        text_rect = text_surface.get_rect(midbottom =  (SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20)).move(origin)
 
-        pygame.draw.rect(self.display_surface, 'White', text_rect.inflate(10, 10), 0, 4)
-        self.display_surface.blit(text_surface, text_rect)
+        pygame.draw.rect(surface, 'White', text_rect.inflate(10, 10), 0, 4)
+        surface.blit(text_surface, text_rect)
     
     def setup(self):
 
@@ -39,7 +52,7 @@ class Menu:
         self.total_height = 0
 
         for item in self.options:
-            text_surface = self.font.render(item, False, 'Black')
+            text_surface = text_cache.render(self.font, item, 'Black')
             self.text_surfaces.append(text_surface)
             self.total_height += text_surface.get_height() + (self.padding * 2)
         self.total_height += (len(self.text_surfaces) - 1) * self.space
@@ -47,12 +60,11 @@ class Menu:
         self.main_rect = pygame.Rect(SCREEN_WIDTH / 2 - self.width / 2, self.menu_top, self.width, self.total_height)
 
         #
-        self.buy_text = self.font.render('Buy', False, 'Black')
-        self.sell_text = self.font.render('Sell', False, 'Black')
+        self.buy_text = text_cache.render(self.font, 'Buy', 'Black')
+        self.sell_text = text_cache.render(self.font, 'Sell', 'Black')
 
     def input(self):
-        keys = pygame.key.get_pressed()
-        self.timer.update()
+        keys = controls.get_pressed()
 
         if keys[pygame.K_ESCAPE]:
             self.toggle_menu()
@@ -92,36 +104,55 @@ class Menu:
             if self.index > len(self.options) - 1:
                 self.index = 0
     
-    def show_entry(self, text_surface, amount, top, selected):
-        
+    def show_entry(self, surface, origin, text_surface, amount, top, selected):
+        main_rect = self.main_rect.move(origin)
+
         # Background
-        bg_rect = pygame.Rect(self.main_rect.left, top, self.width, text_surface.get_height() + self.padding * 2)
-        pygame.draw.rect(self.display_surface, 'White', bg_rect, 0, 4)
+        bg_rect = pygame.Rect(main_rect.left, top + origin[1], self.width, text_surface.get_height() + self.padding * 2)
+        pygame.draw.rect(surface, 'White', bg_rect, 0, 4)
 
         # Text
-        text_rect = text_surface.get_rect(midleft = (self.main_rect.left + 20, bg_rect.centery))
-        self.display_surface.blit(text_surface, text_rect)
+        text_rect = text_surface.get_rect(midleft = (main_rect.left + 20, bg_rect.centery))
+        surface.blit(text_surface, text_rect)
 
         # Amount
-        amount_surface = self.font.render(str(amount), False, 'Black')
-        amount_rect = amount_surface.get_rect(midright = (self.main_rect.right - 20, bg_rect.centery))
-        self.display_surface.blit(amount_surface, amount_rect)
+        amount_surface = text_cache.render(self.font, str(amount), 'Black')
+        amount_rect = amount_surface.get_rect(midright = (main_rect.right - 20, bg_rect.centery))
+        surface.blit(amount_surface, amount_rect)
 
         # Selection
         if selected:
-            pygame.draw.rect(self.display_surface, 'Black', bg_rect, 4, 4)
+            pygame.draw.rect(surface, 'Black', bg_rect, 4, 4)
             if self.index <= self.sell_border: # Sell
-                position_rect = self.sell_text.get_rect(midleft = (self.main_rect.left + 150, bg_rect.centery))
-                self.display_surface.blit(self.sell_text, position_rect)
+                position_rect = self.sell_text.get_rect(midleft = (main_rect.left + 150, bg_rect.centery))
+                surface.blit(self.sell_text, position_rect)
             else: # Buy
-                position_rect = self.buy_text.get_rect(midleft = (self.main_rect.left + 150, bg_rect.centery))
-                self.display_surface.blit(self.buy_text, position_rect)
+                position_rect = self.buy_text.get_rect(midleft = (main_rect.left + 150, bg_rect.centery))
+                surface.blit(self.buy_text, position_rect)
+
+    def create_panel(self):
+        # Entries and the money label on one surface just large enough for both. The panel is only
+        # black and white, so a colour key is enough for the gaps and run-length encoding makes the blit cheap
+        money_surface = text_cache.render(self.font, f'${self.player.money}', 'Black')
+        money_rect = money_surface.get_rect(midbottom =  (SCREEN_WIDTH / 2, SCREEN_HEIGHT - 20)).inflate(10, 10)
+        self.panel_rect = self.main_rect.union(money_rect)
+        self.panel = pygame.Surface(self.panel_rect.size).convert()
+        self.panel.fill(PANEL_COLORKEY)
+        origin = (-self.panel_rect.x, -self.panel_rect.y)
+
+        self.display_money(self.panel, origin)
+        amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
+        for text_index, text_surface in enumerate(self.text_surfaces):
+            top = self.main_rect.top + text_index * (text_surface.get_height() + self.padding * 2 + self.space)
+            self.show_entry(self.panel, origin, text_surface, amount_list[text_index], top, self.index == text_index)
+        self.panel.set_colorkey(PANEL_COLORKEY, pygame.RLEACCEL)
     
     def update(self):
         self.input()
-        self.display_money()
-        for text_index, text_surface in enumerate(self.text_surfaces):
-            top = self.main_rect.top + text_index * (text_surface.get_height() + self.padding * 2 + self.space)
-            amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
-            amount = amount_list[text_index]
-            self.show_entry(text_surface, amount, top, self.index == text_index)
\ No newline at end of file
+
+    def display(self):
+        state = self.get_state()
+        if state != self.panel_state:
+            self.panel_state = state
+            self.create_panel()
+        self.display_surface.blit(self.panel, self.panel_rect)
\ No newline at end of file
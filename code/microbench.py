@@ -0,0 +1,255 @@
+import os, sys, json, argparse
+from time import perf_counter
+
+# Offscreen, no sound card needed
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+from settings import *
+from level import Level
+from mapgen import generate_map
+from soil import FARMABLE
+from rng import rng
+from save import take_snapshot, save_game, load_game
+
+# Map sizes the fixtures are built at, None is the shipped map
+SCALES = {'shipped': None, '100x100': (100, 100), '200x200': (200, 200), 'farm': (150, 150), 'farm100k': (430, 430)}
+DEFAULT_SCALES = ['shipped', '100x100']
+
+# Generator densities of the scales that are not plain maps, farm has over 10k farmable tiles
+# so the soil actions can be compared against the shipped farm. farm100k has over 100k for the day rollover
+# and about as many trees as the shipped map, whose apples would otherwise dominate the rollover
+SCALE_DENSITIES = {'farm': {'farmable': 0.75}, 'farm100k': {'farmable': 0.75, 'trees': 0.0002}}
+
+class Fixture:
+    def __init__(self, map_path):
+        rng.seed(1)
+        self.level = Level(map_path)
+        self.level.music.stop()
+        self.level.raining = True
+        self.level.soil_layer.raining = False
+        self.player = self.level.player
+        self.soil_layer = self.level.soil_layer
+        self.tiles = [rect.center for rect in self.soil_layer.hit_rects]
+
+        # Crops around the player get sprites, like during play
+        self.level.view_rect.center = self.player.rect.center
+        self.soil_layer.update_visible(self.level.view_rect)
+
+    def clear_soil(self):
+        soil_layer = self.soil_layer
+        soil_layer.clear_plants()
+        soil_layer.remove_water()
+        soil_layer.grid &= FARMABLE
+        soil_layer.create_soil_tiles()
+
+    def till(self, fraction = 1):
+        for position in self.tiles[:int(len(self.tiles) * fraction)]:
+            self.soil_layer.get_hit(position)
+
+    def plant(self, fraction = 1):
+        for index, position in enumerate(self.tiles[:int(len(self.tiles) * fraction)]):
+            self.soil_layer.plant_seed(position, self.player.seeds[index % len(self.player.seeds)])
+
+# Each benchmark returns (setup, operation, operation count). Setup runs untimed before every round,
+# the operation is timed and called with the index of the operation in the round
+def bench_custom_draw(fixture):
+    fixture.clear_soil()
+    fixture.till(0.5)
+    fixture.plant(0.5)
+    all_sprites, player = fixture.level.all_sprites, fixture.player
+    return None, lambda index: all_sprites.custom_draw(player), 1
+
+def unbucketed_draw(group, player):
+    # custom_draw as it was before the render queue: every sprite of the group sorted once per layer and
+    # blitted one by one. The renderers are drawn like in custom_draw, so both draw the same frame
+    offset_x = int(player.rect.x + player.rect.width // 2 - SCREEN_WIDTH / 2)
+    offset_y = int(player.rect.y + player.rect.height // 2 - SCREEN_HEIGHT / 2)
+    camera_rect = pygame.Rect(offset_x, offset_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+    surface = group.display_surface
+    surface.fill('black')
+    for layer in LAYERS.values():
+        for renderer in group.renderers.get(layer, ()):
+            surface.blits(renderer.blits(camera_rect), doreturn = False)
+        for sprite in sorted(group.sprites(), key = lambda sprite: sprite.rect.centery):
+            if sprite.z == layer:
+                surface.blit(sprite.image, (sprite.rect.x - offset_x, sprite.rect.y - offset_y))
+
+def bench_unbucketed_draw(fixture):
+    # The before side of CameraGroup.custom_draw on the same sprites
+    fixture.clear_soil()
+    fixture.till(0.5)
+    fixture.plant(0.5)
+    all_sprites, player = fixture.level.all_sprites, fixture.player
+    return None, lambda index: unbucketed_draw(all_sprites, player), 1
+
+def bench_collision(fixture):
+    player = fixture.player
+    swept_hitbox = player.hitbox.inflate(TILE_SIZE, TILE_SIZE)
+    return None, lambda index: player.collision('horizontal', swept_hitbox), 1
+
+def bench_get_status(fixture):
+    player = fixture.player
+    return None, lambda index: player.get_status(), 1
+
+def bench_get_hit(fixture):
+    tiles, soil_layer = fixture.tiles, fixture.soil_layer
+    return fixture.clear_soil, lambda index: soil_layer.get_hit(tiles[index]), len(tiles)
+
+def bench_water(fixture):
+    tiles, soil_layer = fixture.tiles, fixture.soil_layer
+    fixture.clear_soil()
+    fixture.till()
+    return soil_layer.remove_water, lambda index: soil_layer.water(tiles[index]), len(tiles)
+
+def bench_plant_seed(fixture):
+    tiles, soil_layer = fixture.tiles, fixture.soil_layer
+    def setup():
+        fixture.clear_soil()
+        fixture.till()
+    return setup, lambda index: soil_layer.plant_seed(tiles[index], 'corn'), len(tiles)
+
+def bench_update_plants(fixture):
+    fixture.clear_soil()
+    fixture.till()
+    fixture.plant()
+    fixture.soil_layer.water_all()
+    return fixture.plant, lambda index: fixture.soil_layer.update_plants(), 1
+
+def bench_reset(fixture):
+    # A day rollover with every farmable tile planted, the crops of the first rounds still growing
+    fixture.clear_soil()
+    fixture.till()
+    fixture.plant()
+    return None, lambda index: fixture.level.reset(), 1
+
+def bench_create_soil_tiles(fixture):
+    fixture.clear_soil()
+    fixture.till()
+    return None, lambda index: fixture.soil_layer.create_soil_tiles(), 1
+
+def bench_plant_collision(fixture):
+    fixture.clear_soil()
+    fixture.till()
+    fixture.plant()
+    return None, lambda index: fixture.level.plant_collision(), 1
+
+def bench_sky(fixture):
+    sky = fixture.level.sky
+    sky.time = DAY_NIGHT_CURVE[-1][0] / 2
+    return None, lambda index: sky.display(), 1
+
+def bench_rain(fixture):
+    rain = fixture.level.rain
+    return None, lambda index: rain.update(1 / SIMULATION_RATE, True), 1
+
+def bench_menu(fixture):
+    menu = fixture.level.menu
+    def operation(index):
+        menu.update()
+        menu.display()
+    return None, operation, 1
+
+def bench_take_snapshot(fixture):
+    fixture.clear_soil()
+    fixture.till()
+    fixture.plant()
+    return None, lambda index: take_snapshot(fixture.level), 1
+
+def bench_load_game(fixture):
+    # Restoring a fully planted farm, compare with the till and plant benchmarks that build one tile at a time
+    fixture.clear_soil()
+    fixture.till()
+    fixture.plant()
+    path = './data/generated/microbench.sav'
+    save_game(fixture.level, path)
+    return None, lambda index: load_game(fixture.level, path), 1
+
+BENCHMARKS = {
+    'CameraGroup.custom_draw': bench_custom_draw,
+    'CameraGroup.unbucketed_draw': bench_unbucketed_draw,
+    'Player.collision': bench_collision,
+    'Player.get_status': bench_get_status,
+    'SoilLayer.get_hit': bench_get_hit,
+    'SoilLayer.water': bench_water,
+    'SoilLayer.plant_seed': bench_plant_seed,
+    'SoilLayer.update_plants': bench_update_plants,
+    'SoilLayer.create_soil_tiles': bench_create_soil_tiles,
+    'Level.reset': bench_reset,
+    'Level.plant_collision': bench_plant_collision,
+    'Sky.display': bench_sky,
+    'Rain.update': bench_rain,
+    'Menu.update': bench_menu,
+    'save.take_snapshot': bench_take_snapshot,
+    'save.load_game': bench_load_game}
+
+def measure(setup, operation, count, min_time, rounds):
+    # Best of several rounds, each round runs whole batches for at least min_time
+    best = 0
+    for _ in range(rounds):
+        operations = 0
+        elapsed = 0
+        while elapsed < min_time:
+            if setup:
+                setup()
+            start = perf_counter()
+            for index in range(count):
+                operation(index)
+            elapsed += perf_counter() - start
+            operations += count
+        best = max(best, operations / elapsed)
+    return best
+
+def run(scales, names, min_time = 0.2, rounds = 3):
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    results = {}
+    for scale in scales:
+        size = SCALES[scale]
+        map_path = generate_map(f'./data/generated/synthetic_{scale}_1.tmx', *size, SCALE_DENSITIES.get(scale), seed = 1) if size else MAP_PATH
+        fixture = Fixture(map_path)
+        print(f'{scale}: {len(fixture.tiles):,} farmable tiles', flush = True)
+        for name in names:
+            setup, operation, count = BENCHMARKS[name](fixture)
+            if count:
+                results[f'{name}[{scale}]'] = measure(setup, operation, count, min_time, rounds)
+                print(f'{name}[{scale}]: {results[f"{name}[{scale}]"]:,.0f} ops/s', flush = True)
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, ops in results.items():
+        if key in baseline and ops < baseline[key] * (1 - tolerance):
+            regressions.append(f'{key}: {ops:,.0f} ops/s, baseline {baseline[key]:,.0f} ops/s ({ops / baseline[key] - 1:+.0%})')
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Time the per-frame hot functions offscreen and report ops/sec.')
+    parser.add_argument('--scale', action = 'append', choices = list(SCALES), help = 'map scale to run, shipped and 100x100 by default')
+    parser.add_argument('--only', action = 'append', choices = list(BENCHMARKS), help = 'benchmark to run, all by default')
+    parser.add_argument('--min-time', type = float, default = 0.2, help = 'seconds per round')
+    parser.add_argument('--rounds', type = int, default = 3)
+    parser.add_argument('--output', help = 'write the results to this JSON file')
+    parser.add_argument('--save-baseline', help = 'store the results as the baseline file')
+    parser.add_argument('--baseline', help = 'fail when a result is slower than this baseline file')
+    parser.add_argument('--tolerance', type = float, default = 0.15, help = 'allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    results = run(args.scale or DEFAULT_SCALES, args.only or list(BENCHMARKS), args.min_time, args.rounds)
+    pygame.quit()
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as file:
+                json.dump(results, file, indent = 4, sort_keys = True)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions against {args.baseline}:')
+            print('\n'.join(regressions))
+            sys.exit(1)
+        print(f'no regressions against {args.baseline}')
@@ -1,7 +1,9 @@
 import pygame
 from settings import *
 from support import *
-from timer import Timer
+from timer import Timer, simulation_clock
+from animation import get_animation
+from controls import controls
 
 class Player(pygame.sprite.Sprite): 
     def __init__(self, position, group, collision_sprites, tree_sprites, interaction, soil_layer, toggle_shop):  
@@ -9,10 +11,10 @@ class Player(pygame.sprite.Sprite):
 
         self.import_assets()
         self.status = 'down_idle' 
-        self.frame_index = 0
+        self.animation_start = simulation_clock.time
 
         # Create the player
-        self.image = self.animations[self.status][self.frame_index]
+        self.image = self.animations[self.status].frames[0]
         self.rect = self.image.get_rect(center = position) 
         self.z = LAYERS['main']
         
@@ -64,7 +66,7 @@ class Player(pygame.sprite.Sprite):
         self.toggle_shop = toggle_shop
 
         # Sounds
-        self.watering = pygame.mixer.Sound('./audio/water.mp3')
+        self.watering = load_sound('./audio/water.mp3')
         self.watering.set_volume(0.2)
 
     def use_tool(self):
@@ -72,9 +74,8 @@ class Player(pygame.sprite.Sprite):
             self.soil_layer.get_hit(self.target_position)
 
         if self.selected_tool == 'axe':
-            for tree in self.tree_sprites.sprites():
-                if tree.rect.collidepoint(self.target_position):
-                    tree.damage()
+            for tree in self.tree_sprites.at_point(self.target_position):
+                tree.damage()
 
         if self.selected_tool == 'water':
             self.soil_layer.water(self.target_position)
@@ -98,18 +99,15 @@ class Player(pygame.sprite.Sprite):
         
         for animation in self.animations.keys():
             full_path = './graphics/character/' + animation
-            self.animations[animation] = import_folder(full_path)
+            self.animations[animation] = get_animation(full_path, 4)
 
     def animate(self, dt):
-        self.frame_index += 4 * dt # Increase the frame index 
-        if self.frame_index >= len(self.animations[self.status]): # If the frame index is greater than the length of the animation
-            self.frame_index = 0 # Reset the frame index
-
-        self.image = self.animations[self.status][int(self.frame_index)] # Set the image to the current frame
+        # The frame follows the shared simulation clock from the start of the current animation
+        self.image = self.animations[self.status].current_frame(self.animation_start)
     
     # Get the input from the player
     def input(self): 
-        keys = pygame.key.get_pressed() # Get the keys that are pressed
+        keys = controls.get_pressed() # Get the keys that are pressed
 
         if not self.timers['tool use'].active and not self.sleep: # If the player is not using a tool
             # Change the player's direction
@@ -136,7 +134,7 @@ class Player(pygame.sprite.Sprite):
             if keys[pygame.K_SPACE]:
                 self.timers['tool use'].activate()
                 self.direction = pygame.math.Vector2() # Set the direction to 0
-                self.frame_index = 0 # Guarantee the animation starts from the beginning
+                self.animation_start = simulation_clock.time # Guarantee the animation starts from the beginning
 
             # Change the selected tool
             if keys[pygame.K_q] and not self.timers['tool switch'].active:
@@ -148,7 +146,7 @@ class Player(pygame.sprite.Sprite):
             if keys[pygame.K_LCTRL]:
                 self.timers['seed use'].activate()
                 self.direction = pygame.math.Vector2() # Set the direction to 0
-                self.frame_index = 0 # Guarantee the animation starts from the beginning
+                self.animation_start = simulation_clock.time # Guarantee the animation starts from the beginning
 
             # Change the selected seed
             if keys[pygame.K_e] and not self.timers['seed switch'].active:
@@ -157,7 +155,7 @@ class Player(pygame.sprite.Sprite):
                 self.selected_seed = self.seeds[self.seed_index % len(self.seeds)]
 
             if keys[pygame.K_RETURN]:
-                collided_interaction_sprite = pygame.sprite.spritecollide(self, self.interaction, False)
+                collided_interaction_sprite = self.interaction.colliding(self.rect)
                 if collided_interaction_sprite:
                     if collided_interaction_sprite[0].name == 'Trader':
                         self.toggle_shop()
@@ -165,10 +163,6 @@ class Player(pygame.sprite.Sprite):
                         self.status = 'left_idle'
                         self.sleep = True
 
-    def update_timers(self):
-        for timer in self.timers.values():
-            timer.update()
-    
     def get_status(self):
             # Idle animation
             if self.direction.magnitude() == 0:
@@ -178,24 +172,24 @@ class Player(pygame.sprite.Sprite):
             if self.timers['tool use'].active:
                 self.status = self.status.split('_')[0] + '_' + self.selected_tool
 
-    def collision(self, direction):
-        for sprite in self.collision_sprites.sprites():
-            if hasattr(sprite, 'hitbox'):
-                if sprite.hitbox.colliderect(self.hitbox):
-                    if direction == 'horizontal':
-                        if self.direction.x > 0: # Moving right
-                            self.hitbox.right = sprite.hitbox.left
-                        if self.direction.x < 0: # Moving left
-                            self.hitbox.left = sprite.hitbox.right
-                        self.rect.centerx = self.hitbox.centerx
-                        self.position.x = self.hitbox.centerx
-                    if direction == 'vertical':
-                        if self.direction.y > 0: # Moving down
-                            self.hitbox.bottom = sprite.hitbox.top
-                        if self.direction.y < 0: # Moving up
-                            self.hitbox.top = sprite.hitbox.bottom
-                        self.rect.centery = self.hitbox.centery
-                        self.position.y = self.hitbox.centery
+    def collision(self, direction, swept_hitbox):
+        # Only the sprites near the swept hitbox can collide, in the same order as the group
+        for sprite in self.collision_sprites.query(swept_hitbox):
+            if sprite.hitbox.colliderect(self.hitbox):
+                if direction == 'horizontal':
+                    if self.direction.x > 0: # Moving right
+                        self.hitbox.right = sprite.hitbox.left
+                    if self.direction.x < 0: # Moving left
+                        self.hitbox.left = sprite.hitbox.right
+                    self.rect.centerx = self.hitbox.centerx
+                    self.position.x = self.hitbox.centerx
+                if direction == 'vertical':
+                    if self.direction.y > 0: # Moving down
+                        self.hitbox.bottom = sprite.hitbox.top
+                    if self.direction.y < 0: # Moving up
+                        self.hitbox.top = sprite.hitbox.bottom
+                    self.rect.centery = self.hitbox.centery
+                    self.position.y = self.hitbox.centery
 
     # Move the player
     def move(self, dt):
@@ -204,21 +198,22 @@ class Player(pygame.sprite.Sprite):
             self.direction = self.direction.normalize() # Normalize the direction vector
 
         # Horizontal movement
+        previous_hitbox = self.hitbox.copy()
         self.position.x += self.direction.x * self.speed * dt
         self.hitbox.centerx = round(self.position.x)
         self.rect.centerx = self.hitbox.centerx
-        self.collision('horizontal')
+        self.collision('horizontal', self.hitbox.union(previous_hitbox))
 
         # Vertical movement
+        previous_hitbox = self.hitbox.copy()
         self.position.y += self.direction.y * self.speed * dt
         self.hitbox.centery = round(self.position.y)
         self.rect.centery = self.hitbox.centery
-        self.collision('vertical')
+        self.collision('vertical', self.hitbox.union(previous_hitbox))
         
     def update(self, dt):
         self.input()
         self.get_status()
-        self.update_timers()
         self.get_target_position()
 
         self.move(dt)
@@ -0,0 +1,180 @@
+import pygame, csv, json
+from bisect import bisect_right
+from collections import deque
+from time import perf_counter
+from settings import *
+
+class Stage:
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exception):
+        self.timings[self.name] = self.timings.get(self.name, 0) + perf_counter() - self.start
+
+class NullStage:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exception):
+        pass
+
+class Profiler:
+    def __init__(self, history = PROFILER_HISTORY):
+        # Nothing is measured unless the HUD is shown or a trace is recording
+        self.visible = False
+        self.tracing = False
+        self.enabled = False
+
+        # Stage times of the current frame, in seconds
+        self.timings = {}
+        self.stages = {}
+        self.null_stage = NullStage()
+        self.frame_start = None
+        self.work_start = None
+
+        # Recent frames for the HUD and every frame for the trace
+        self.frame_times = deque(maxlen = history)
+        self.work_times = deque(maxlen = history)
+        self.stage_history = deque(maxlen = history)
+        self.trace = []
+        self.groups = {}
+
+        # HUD
+        self.font = None
+        self.hud_surface = None
+        self.hud_time = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.update_enabled()
+
+    def start_trace(self):
+        self.tracing = True
+        self.trace = []
+        self.update_enabled()
+
+    def update_enabled(self):
+        self.enabled = self.visible or self.tracing
+        self.frame_start = None
+        self.work_start = None
+
+    def watch_groups(self, groups):
+        self.groups = groups
+
+    def stage(self, name):
+        if not self.enabled:
+            return self.null_stage
+        if name not in self.stages:
+            self.stages[name] = Stage(self.timings, name)
+        return self.stages[name]
+
+    def begin_frame(self):
+        if self.enabled:
+            self.work_start = perf_counter()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+
+        # A frame lasts from one end_frame to the next, so it includes waiting for the frame cap,
+        # the work is only the part after begin_frame
+        now = perf_counter()
+        if self.frame_start is not None and self.work_start is not None:
+            frame_time = now - self.frame_start
+            work_time = now - self.work_start
+            self.frame_times.append(frame_time)
+            self.work_times.append(work_time)
+            self.stage_history.append(dict(self.timings))
+            if self.tracing:
+                self.trace.append(dict(self.timings, frame = frame_time, work = work_time))
+        self.frame_start = now
+        self.timings.clear()
+
+    def export(self, path):
+        # Milliseconds, one row per frame
+        columns = ['frame', 'work'] + sorted({name for frame in self.trace for name in frame} - {'frame', 'work'})
+        rows = [{name: round(frame.get(name, 0) * 1000, 4) for name in columns} for frame in self.trace]
+        with open(path, 'w', newline = '') as file:
+            if path.endswith('.csv'):
+                writer = csv.DictWriter(file, fieldnames = columns)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump({'unit': 'ms', 'frames': rows}, file, indent = 1)
+
+    def histogram(self):
+        # Recent frames per frame time bin
+        counts = [0] * (len(PROFILER_HISTOGRAM_BINS) + 1)
+        for frame_time in self.frame_times:
+            counts[bisect_right(PROFILER_HISTOGRAM_BINS, frame_time * 1000)] += 1
+        return counts
+
+    def create_hud(self):
+        average = sum(self.frame_times) / len(self.frame_times)
+        average_work = sum(self.work_times) / len(self.work_times)
+        stage_totals = {}
+        for frame in self.stage_history:
+            for name, duration in frame.items():
+                stage_totals[name] = stage_totals.get(name, 0) + duration
+
+        lines = [f'{1 / average if average else 0:.0f} fps  {average_work * 1000:.2f} ms work']
+        for name, total in sorted(stage_totals.items(), key = lambda item: -item[1]):
+            lines.append(f'{name}: {total / len(self.stage_history) * 1000:.2f} ms')
+        for name, group in self.groups.items():
+            lines.append(f'{name}: {len(group)} sprites')
+
+        text_surfaces = [self.font.render(line, False, 'White') for line in lines]
+        line_height = self.font.get_linesize()
+        width = max(PROFILER_HISTORY * 2, max(surface.get_width() for surface in text_surfaces)) + 20
+        histogram_top = line_height * len(lines) + PROFILER_GRAPH_HEIGHT + 30
+        height = histogram_top + PROFILER_GRAPH_HEIGHT + line_height + 10
+
+        self.hud_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.hud_surface.fill((0, 0, 0, 170))
+        for index, text_surface in enumerate(text_surfaces):
+            self.hud_surface.blit(text_surface, (10, 10 + index * line_height))
+
+        # Work time of the recent frames, the line marks the frame budget
+        graph_bottom = histogram_top - 10
+        budget = 1000 / SIMULATION_RATE
+        scale = PROFILER_GRAPH_HEIGHT / (budget * 2)
+        for index, work_time in enumerate(self.work_times):
+            bar_height = min(PROFILER_GRAPH_HEIGHT, work_time * 1000 * scale)
+            color = 'Green' if work_time * 1000 <= budget else 'Red'
+            pygame.draw.line(self.hud_surface, color, (10 + index * 2, graph_bottom), (10 + index * 2, graph_bottom - bar_height))
+        budget_y = graph_bottom - budget * scale
+        pygame.draw.line(self.hud_surface, 'White', (10, budget_y), (width - 10, budget_y))
+
+        # Frame time histogram, every bin is labelled with its upper edge in ms
+        counts = self.histogram()
+        labels = [str(edge) for edge in PROFILER_HISTOGRAM_BINS] + [f'>{PROFILER_HISTOGRAM_BINS[-1]}']
+        lower_edges = (0,) + PROFILER_HISTOGRAM_BINS
+        bin_width = (width - 20) // len(counts)
+        histogram_bottom = histogram_top + PROFILER_GRAPH_HEIGHT
+        for index, (count, label) in enumerate(zip(counts, labels)):
+            left = 10 + index * bin_width
+            bar_height = PROFILER_GRAPH_HEIGHT * count / max(counts)
+            color = 'Green' if lower_edges[index] < budget else 'Red'
+            pygame.draw.rect(self.hud_surface, color, (left + 1, histogram_bottom - bar_height, bin_width - 2, bar_height))
+            label_surface = self.font.render(label, False, 'White')
+            self.hud_surface.blit(label_surface, label_surface.get_rect(midtop = (left + bin_width / 2, histogram_bottom + 2)))
+
+    def display(self):
+        if not self.visible or not self.frame_times:
+            return
+
+        # The text only changes a few times per second
+        now = perf_counter()
+        if self.hud_surface is None or now - self.hud_time > PROFILER_REFRESH:
+            if self.font is None:
+                self.font = pygame.font.Font('./font/LycheeSoda.ttf', 20)
+            self.create_hud()
+            self.hud_time = now
+        pygame.display.get_surface().blit(self.hud_surface, (10, 10))
+
+profiler = Profiler()
@@ -0,0 +1,103 @@
+import os, sys, json, gzip, argparse
+from hashlib import sha1
+import pygame
+from settings import *
+from rng import rng
+from controls import controls
+from timer import simulation_clock
+from level import Level
+
+REPLAY_VERSION = 3
+
+def state_hash(level):
+    # Everything the simulation decides, nothing that only depends on drawing
+    player = level.player
+    soil_layer = level.soil_layer
+    state = [
+        simulation_clock.get_ticks(),
+        level.raining,
+        level.shop_active,
+        level.sky.time,
+        level.menu.index,
+        tuple(player.hitbox),
+        tuple(player.position),
+        player.status,
+        player.selected_tool,
+        player.selected_seed,
+        player.sleep,
+        player.money,
+        sorted(player.item_inventory.items()),
+        sorted(player.seed_inventory.items()),
+        [(tuple(tree.rect), tree.health, tree.alive, sorted(apple.rect.topleft for apple in tree.apple_sprites)) for tree in level.tree_sprites]]
+
+    digest = sha1(repr(state).encode())
+    digest.update(soil_layer.grid.tobytes())
+    for array in soil_layer.crops.state().values():
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def save_recording(path, level, map_path):
+    recording = {
+        'version': REPLAY_VERSION,
+        'seed': rng.seed_value,
+        'map': map_path,
+        'rate': SIMULATION_RATE,
+        'steps': controls.steps,
+        'inputs': controls.recording,
+        'hash': state_hash(level)}
+    with gzip.open(path, 'wt') as file:
+        json.dump(recording, file, separators = (',', ':'))
+    return recording
+
+def load_recording(path):
+    with gzip.open(path, 'rt') as file:
+        recording = json.load(file)
+    if recording.get('version') != REPLAY_VERSION:
+        raise ValueError(f'{path} is a version {recording.get("version")} recording, expected {REPLAY_VERSION}')
+    return recording
+
+def replay(recording, window = False):
+    # The same seed, map and step rate as the recorded session
+    rng.seed(recording['seed'])
+    level = Level(recording['map'])
+    controls.start_replay(recording['inputs'])
+    step = 1 / recording['rate']
+    clock = pygame.time.Clock()
+
+    for _ in range(recording['steps']):
+        if window:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+
+        level.update(step)
+
+        if window:
+            level.draw()
+            pygame.display.update()
+            clock.tick(recording['rate'])
+    return level
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Replay a recorded session and check its final state.')
+    parser.add_argument('path')
+    parser.add_argument('--window', action = 'store_true', help = 'show the replay in real time instead of running it headless')
+    args = parser.parse_args()
+
+    if not args.window:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    recording = load_recording(args.path)
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    level = replay(recording, args.window)
+    pygame.mixer.stop()
+
+    result = state_hash(level)
+    print(f'{recording["steps"]} steps, state {result}')
+    if result != recording['hash']:
+        print(f'mismatch, the recording ended in state {recording["hash"]}')
+        sys.exit(1)
+    print('state matches the recording')
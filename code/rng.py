@@ -0,0 +1,22 @@
+import random
+import numpy as np
+
+class RandomService:
+    def __init__(self, seed = None):
+        self.seed(seed)
+
+    def seed(self, seed = None):
+        # Without a seed one is drawn, so the session can still be recorded and replayed
+        self.seed_value = random.SystemRandom().randrange(2 ** 32) if seed is None else seed
+
+        # Gameplay and rain effects use separate streams, drawing never changes gameplay
+        self.random = random.Random(self.seed_value)
+        self.effects = np.random.default_rng(self.seed_value)
+
+    def randint(self, a, b):
+        return self.random.randint(a, b)
+
+    def choice(self, sequence):
+        return self.random.choice(sequence)
+
+rng = RandomService()
\ No newline at end of file
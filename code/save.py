@@ -0,0 +1,192 @@
+import os, json, struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from settings import *
+from crops import CROP_TYPES
+
+SAVE_MAGIC = b'SPRT'
+SAVE_VERSION = 1
+
+# Magic, version, grid width, grid height, crop count, tree count, apple count, header length
+SAVE_HEADER = struct.Struct('<4sHIIIIII')
+
+# Column types of the crop and tree records, little endian on every platform
+CROP_COLUMNS = (('x', '<u2'), ('y', '<u2'), ('kind', 'u1'), ('age', '<f8'))
+TREE_COLUMNS = (('health', '<i2'), ('alive', 'u1'), ('apple_count', 'u1'))
+APPLE_DTYPE = '<i2'
+
+def take_snapshot(level):
+    # Runs on the main thread, so everything is copied and nothing refers back to the level
+    player = level.player
+    soil_layer = level.soil_layer
+    trees = level.tree_sprites.sprites()
+    apples = [[(apple.rect.left - tree.rect.left, apple.rect.top - tree.rect.top) for apple in tree.apple_sprites] if tree.apple_sprites else [] for tree in trees]
+    return {
+        'header': {
+            'raining': level.raining,
+            'money': player.money,
+            'item_inventory': dict(player.item_inventory),
+            'seed_inventory': dict(player.seed_inventory)},
+        'grid': soil_layer.grid.copy(),
+        'crops': soil_layer.crops.columns(),
+        'trees': {
+            'health': [tree.health for tree in trees],
+            'alive': [tree.alive for tree in trees],
+            'apple_count': [len(tree_apples) for tree_apples in apples]},
+        'apples': [offset for tree_apples in apples for offset in tree_apples]}
+
+def pack_grid(grid):
+    # Soil flags fit in four bits, two tiles share a byte
+    flat = grid.ravel()
+    if len(flat) % 2:
+        flat = np.append(flat, np.uint8(0))
+    return ((flat[0::2] << 4) | flat[1::2]).tobytes()
+
+def unpack_grid(data, width, height):
+    packed = np.frombuffer(data, dtype = np.uint8)
+    flat = np.empty(len(packed) * 2, dtype = np.uint8)
+    flat[0::2] = packed >> 4
+    flat[1::2] = packed & 15
+    return flat[:width * height].reshape(height, width)
+
+def encode_save(snapshot):
+    header = json.dumps(snapshot['header'], separators = (',', ':')).encode()
+    grid = snapshot['grid']
+    crops = snapshot['crops']
+    trees = snapshot['trees']
+    apples = np.array(snapshot['apples'], dtype = APPLE_DTYPE).reshape(-1, 2)
+
+    parts = [
+        SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, grid.shape[1], grid.shape[0], len(crops['x']), len(trees['health']), len(apples), len(header)),
+        header,
+        pack_grid(grid)]
+    parts.extend(np.ascontiguousarray(crops[name], dtype = dtype).tobytes() for name, dtype in CROP_COLUMNS)
+    parts.append(np.packbits(crops['harvestable']).tobytes())
+    parts.extend(np.array(trees[name], dtype = dtype).tobytes() for name, dtype in TREE_COLUMNS)
+    parts.append(apples.tobytes())
+    return b''.join(parts)
+
+def decode_save(data, path = 'save'):
+    if len(data) < SAVE_HEADER.size:
+        raise ValueError(f'{path} is not a save file')
+    magic, version, width, height, crop_count, tree_count, apple_count, header_length = SAVE_HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC:
+        raise ValueError(f'{path} is not a save file')
+    if version != SAVE_VERSION:
+        raise ValueError(f'{path} is a version {version} save, expected {SAVE_VERSION}')
+
+    # Every section has a known size, so a truncated file is caught before anything is read
+    sections = [('header', header_length), ('grid', (width * height + 1) // 2)]
+    sections += [(name, crop_count * np.dtype(dtype).itemsize) for name, dtype in CROP_COLUMNS]
+    sections += [('harvestable', (crop_count + 7) // 8)]
+    sections += [(name, tree_count * np.dtype(dtype).itemsize) for name, dtype in TREE_COLUMNS]
+    sections += [('apples', apple_count * 2 * np.dtype(APPLE_DTYPE).itemsize)]
+    if len(data) != SAVE_HEADER.size + sum(size for _, size in sections):
+        raise ValueError(f'{path} is truncated or corrupt')
+
+    view = memoryview(data)
+    position = SAVE_HEADER.size
+    raw = {}
+    for name, size in sections:
+        raw[name] = view[position:position + size]
+        position += size
+
+    crops = {name: np.frombuffer(raw[name], dtype = dtype) for name, dtype in CROP_COLUMNS}
+    crops['harvestable'] = np.unpackbits(np.frombuffer(raw['harvestable'], dtype = np.uint8), count = crop_count).astype(bool)
+    if crop_count and crops['kind'].max() >= len(CROP_TYPES):
+        raise ValueError(f'{path} contains an unknown crop')
+    return {
+        'header': json.loads(bytes(raw['header'])),
+        'grid': unpack_grid(raw['grid'], width, height),
+        'crops': crops,
+        'trees': {name: np.frombuffer(raw[name], dtype = dtype).tolist() for name, dtype in TREE_COLUMNS},
+        'apples': np.frombuffer(raw['apples'], dtype = APPLE_DTYPE).reshape(-1, 2).tolist()}
+
+def write_save(path, snapshot):
+    # The new file replaces the old one only once it is complete on disk, a crash leaves one or the other
+    data = encode_save(snapshot)
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok = True)
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+    # The rename itself is only durable once the folder is synced, not possible on Windows
+    if hasattr(os, 'O_DIRECTORY'):
+        folder_descriptor = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(folder_descriptor)
+        finally:
+            os.close(folder_descriptor)
+    return len(data)
+
+def read_save(path):
+    with open(path, 'rb') as file:
+        return decode_save(file.read(), path)
+
+def save_game(level, path):
+    return write_save(path, take_snapshot(level))
+
+def load_game(level, path):
+    # Everything is read and checked before the level is touched
+    state = read_save(path)
+    trees = level.tree_sprites.sprites()
+    if state['grid'].shape != level.soil_layer.grid.shape or len(state['trees']['health']) != len(trees):
+        raise ValueError(f'{path} was saved on a different map')
+
+    header = state['header']
+    player = level.player
+    player.money = header['money']
+    player.item_inventory.update(header['item_inventory'])
+    player.seed_inventory.update(header['seed_inventory'])
+
+    level.raining = header['raining']
+    level.soil_layer.raining = level.raining
+    level.soil_layer.restore(state['grid'], state['crops'])
+
+    apples = iter(state['apples'])
+    tree_state = state['trees']
+    for tree, health, alive, apple_count in zip(trees, tree_state['health'], tree_state['alive'], tree_state['apple_count']):
+        tree.restore(health, bool(alive), [next(apples) for _ in range(apple_count)])
+    return state
+
+class Autosaver:
+    def __init__(self):
+        # One worker, so saves reach the disk in the order they were taken
+        self.executor = None
+        self.future = None
+        self.saved = 0
+        self.failed = 0
+
+    def save(self, level, path):
+        # Only the snapshot is taken on the calling thread, encoding and syncing happen on the worker
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(1)
+        snapshot = take_snapshot(level)
+        self.future = self.executor.submit(write_save, path, snapshot)
+        self.future.add_done_callback(lambda future: self.report(future, path))
+        self.saved += 1
+        return self.future
+
+    def report(self, future, path):
+        # Runs on the worker, a failed save is reported and the game keeps running
+        error = future.exception()
+        if error is not None:
+            self.failed += 1
+            print(f'could not save {path}: {error}')
+
+    def wait(self):
+        # Blocks until the last save is on disk and raises its error, if any
+        if self.future is not None:
+            self.future.result()
+
+    def shutdown(self):
+        # Lets the last save finish, its error was already reported
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+autosaver = Autosaver()
\ No newline at end of file
@@ -3,6 +3,9 @@ from pygame.math import Vector2
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 720
 TILE_SIZE = 64
+CHUNK_SIZE = 512
+PLANT_MARGIN = TILE_SIZE * 2
+MAP_PATH = './data/map.tmx'
 
 # overlay positions 
 OVERLAY_POSITIONS = {
@@ -30,6 +33,67 @@ LAYERS = {
 	'rain drops': 10
 }
 
+# Layers whose sprites move and have to be y-sorted every frame
+Y_SORT_LAYERS = (LAYERS['main'], LAYERS['fruit'])
+
+# rain
+RAIN_EMISSION_RATE = 60 # drops per second, for both the floor splashes and the falling drops
+RAIN_CAPACITY = 64
+RAIN_LIFETIME = (400, 500) # ms
+RAIN_SPEED = (200, 250)
+RAIN_DIRECTION = (-2, 4)
+
+# game loop
+SIMULATION_RATE = 60 # fixed update steps per second
+MAX_FRAME_TIME = 0.25 # seconds a single slow frame may catch up on
+MAX_FPS = 60 # render cap, 0 for uncapped
+VSYNC = False
+DIRTY_RECTS = True # redraw only what changed while the camera stands still
+DIRTY_RECT_LIMIT = 0.5 # fraction of the screen above which a full redraw is cheaper
+
+# saving
+SAVE_PATH = './data/saves/farm.sav' # written at the start of every day, loaded on launch
+
+# profiler, toggled with F3
+PROFILER_HISTORY = 120 # frames shown in the HUD
+PROFILER_GRAPH_HEIGHT = 60
+PROFILER_REFRESH = 0.25 # seconds between HUD updates
+PROFILER_HISTOGRAM_BINS = (4, 8, 12, 16, 20, 25, 33) # frame time bin edges in ms, the last bin holds every slower frame
+PROFILER_TRACE = None # path of a .csv or .json file to record every frame to, written on quit
+
+# day / night tint, keyframes of (seconds into the day, colour)
+DAY_NIGHT_CURVE = [
+	(0, (255, 255, 255)),
+	(33, (189, 189, 189)),
+	(77, (101, 101, 189)),
+	(108.5, (38, 101, 189))
+]
+TINT_STEP = 1
+
+# text
+TEXT_CACHE_SIZE = 256 # rendered strings kept by the shared text cache
+
+# assets decoded by the loading screen
+PRELOAD_IMAGES = [
+	'./graphics/character',
+	'./graphics/water',
+	'./graphics/soil',
+	'./graphics/soil_water',
+	'./graphics/rain',
+	'./graphics/fruit',
+	'./graphics/stumps',
+	'./graphics/overlay',
+	'./graphics/world'
+]
+PRELOAD_SOUNDS = [
+	'./audio/success.wav',
+	'./audio/music.mp3',
+	'./audio/hoe.wav',
+	'./audio/plant.wav',
+	'./audio/water.mp3',
+	'./audio/axe.mp3'
+]
+
 APPLE_POSITION = {
 	'Small': [(18,17), (30,37), (12,50), (30,45), (20,30), (30,10)],
 	'Large': [(30,24), (60,65), (50,50), (16,40),(45,50), (42,70)]
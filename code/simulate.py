@@ -0,0 +1,149 @@
+import os, sys, json, argparse
+from time import perf_counter
+
+# No window and no sound card needed
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+from settings import *
+from level import Level
+from rng import rng
+
+class Simulation:
+    def __init__(self, plots = None, crop = 'mixed'):
+        pygame.init()
+        pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.level = Level()
+        self.level.music.stop()
+        self.player = self.level.player
+        self.soil_layer = self.level.soil_layer
+
+        # Farmed tiles, the first farmable ones in map order
+        self.plots = [rect.center for rect in self.soil_layer.hit_rects[:plots]]
+        self.crop = crop
+        self.day = 0
+
+        # Statistics
+        self.stats = {
+            'days': 0,
+            'rainy days': 0,
+            'planted': {seed: 0 for seed in GROW_SPEED},
+            'harvested': {seed: 0 for seed in GROW_SPEED},
+            'seeds bought': {seed: 0 for seed in PURCHASE_PRICES},
+            'spent': 0,
+            'revenue': {item: 0 for item in SALE_PRICES},
+            'days to harvest': {seed: [] for seed in GROW_SPEED},
+            'money': []}
+        self.planted_on = {}
+
+    def choose_seed(self, index):
+        if self.crop == 'mixed':
+            return self.player.seeds[index % len(self.player.seeds)]
+        return self.crop
+
+    def harvest(self):
+        crops = self.soil_layer.crops
+        for tile in crops.harvestable_tiles():
+            plant_type = crops.get(tile)[0]
+            self.level.player_add(plant_type)
+            self.soil_layer.remove_crop(tile)
+            self.stats['harvested'][plant_type] += 1
+            self.stats['days to harvest'][plant_type].append(self.day - self.planted_on.pop(tile))
+
+    def sell(self):
+        # Same prices as the trader menu
+        for item, amount in self.player.item_inventory.items():
+            self.player.money += SALE_PRICES[item] * amount
+            self.stats['revenue'][item] += SALE_PRICES[item] * amount
+            self.player.item_inventory[item] = 0
+
+    def farm(self):
+        player = self.player
+        for index, position in enumerate(self.plots):
+            player.target_position = position
+            tile = self.soil_layer.get_tile(position)
+
+            # Hoe
+            if tile not in self.soil_layer.soil_tiles:
+                player.selected_tool = 'hoe'
+                player.use_tool()
+
+            # Plant, buying the seed first when the bag is empty
+            if tile not in self.soil_layer.crops:
+                seed = self.choose_seed(index)
+                if player.seed_inventory[seed] == 0 and player.money >= PURCHASE_PRICES[seed]:
+                    player.seed_inventory[seed] += 1
+                    player.money -= PURCHASE_PRICES[seed]
+                    self.stats['seeds bought'][seed] += 1
+                    self.stats['spent'] += PURCHASE_PRICES[seed]
+                if player.seed_inventory[seed] > 0:
+                    player.selected_seed = seed
+                    player.use_seed()
+                    self.stats['planted'][seed] += 1
+                    self.planted_on[tile] = self.day
+
+            # Water
+            if not self.level.raining:
+                player.selected_tool = 'water'
+                player.use_tool()
+
+    def run_day(self):
+        self.harvest()
+        self.sell()
+        self.farm()
+
+        # Day rollover, as if the player went to bed
+        self.level.reset()
+        self.day += 1
+        self.stats['days'] += 1
+        self.stats['rainy days'] += self.level.raining
+        self.stats['money'].append(self.player.money)
+
+    def run(self, days):
+        for _ in range(days):
+            self.run_day()
+
+    def report(self):
+        stats = self.stats
+        money = stats['money']
+        return {
+            'days': stats['days'],
+            'rainy days': stats['rainy days'],
+            'final money': money[-1] if money else self.player.money,
+            'lowest money': min(money, default = self.player.money),
+            'money per day': (money[-1] - money[0]) / (len(money) - 1) if len(money) > 1 else 0,
+            'planted': stats['planted'],
+            'harvested': stats['harvested'],
+            'seeds bought': stats['seeds bought'],
+            'spent': stats['spent'],
+            'revenue': stats['revenue'],
+            'average days to harvest': {
+                seed: sum(days) / len(days) if days else None
+                for seed, days in stats['days to harvest'].items()},
+            'growing': len(self.soil_layer.crops)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Fast-forward the farm without a window and print economy statistics.')
+    parser.add_argument('--days', type = int, default = 365)
+    parser.add_argument('--plots', type = int, default = None, help = 'number of farmable tiles to use, all by default')
+    parser.add_argument('--crop', choices = ['mixed'] + list(GROW_SPEED), default = 'mixed')
+    parser.add_argument('--seed', type = int, default = None, help = 'random seed for the weather and the apples')
+    parser.add_argument('--json', help = 'also write the report to this file')
+    args = parser.parse_args()
+
+    rng.seed(args.seed)
+    simulation = Simulation(args.plots, args.crop)
+    start = perf_counter()
+    simulation.run(args.days)
+    elapsed = perf_counter() - start
+
+    report = simulation.report()
+    report['seconds'] = elapsed
+    report['days per minute'] = args.days / elapsed * 60 if elapsed else None
+    print(json.dumps(report, indent = 4))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent = 4)
+    pygame.quit()
+    sys.exit()
\ No newline at end of file
@@ -1,72 +1,119 @@
-import pygame
+import numpy as np
 from settings import *
 from support import import_folder
-from sprites import Generic
-from random import randint, choice
+from lighting import TintLayer
+from rng import rng
 
 class Sky:
-    def __init__(self):
-        self.display_surface = pygame.display.get_surface()
-        self.full_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.start_color = [255, 255, 255]
-        self.end_color = (38, 101, 189)
-
-    def display(self, dt):
-        for index, value in enumerate(self.end_color):
-            if self.start_color[index] > value:
-                self.start_color[index] -= 2 * dt
-
-        self.full_surface.fill(self.start_color)
-        self.display_surface.blit(self.full_surface, (0, 0), special_flags = pygame.BLEND_RGBA_MULT)
-
-class Drop(Generic):
-    def __init__(self, surface, position, moving, groups, z):
-        
-        # General setup
-        super().__init__(position, surface, groups, z)
-        self.lifetime = randint(400, 500)
-        self.start_time = pygame.time.get_ticks()
-
-        # Movement
+    def __init__(self, curve = DAY_NIGHT_CURVE):
+        self.tint = TintLayer()
+        self.curve = curve
+        self.time = 0
+
+    def reset(self):
+        self.time = 0
+
+    def color_at(self, time):
+        # Linear interpolation between the two keyframes around the time
+        previous_time, previous_color = self.curve[0]
+        for keyframe_time, keyframe_color in self.curve:
+            if time <= keyframe_time:
+                if keyframe_time == previous_time:
+                    return keyframe_color
+                progress = (time - previous_time) / (keyframe_time - previous_time)
+                return tuple(start + (end - start) * progress for start, end in zip(previous_color, keyframe_color))
+            previous_time, previous_color = keyframe_time, keyframe_color
+        return previous_color
+
+    def update(self, dt):
+        self.time += dt
+
+    def current_color(self):
+        # The colour the tint layer will actually use
+        return self.tint.quantize(self.color_at(self.time))
+
+    def display(self):
+        self.tint.draw(self.color_at(self.time))
+
+class DropPool:
+    def __init__(self, frames, z, capacity, moving):
+        self.frames = frames
+        self.z = z
+        self.capacity = capacity
         self.moving = moving
-        if self.moving:
-            self.position = pygame.math.Vector2(self.rect.topleft)
-            self.direction = pygame.math.Vector2(-2, 4)
-            self.speed = randint(200, 250)
+
+        # Drop state, one slot per drop
+        self.alive = np.zeros(capacity, dtype = bool)
+        self.position = np.zeros((capacity, 2), dtype = np.float32)
+        self.speed = np.zeros(capacity, dtype = np.float32)
+        self.age = np.zeros(capacity, dtype = np.float32)
+        self.lifetime = np.zeros(capacity, dtype = np.float32)
+        self.frame = np.zeros(capacity, dtype = np.int32)
+        self.previous_position = np.zeros((capacity, 2), dtype = np.float32)
+
+    def emit(self, amount, area, generator):
+        free = np.flatnonzero(~self.alive)[:amount]
+        amount = len(free)
+        self.alive[free] = True
+        self.position[free, 0] = generator.integers(area.left, area.right + 1, amount)
+        self.position[free, 1] = generator.integers(area.top, area.bottom + 1, amount)
+        self.previous_position[free] = self.position[free]
+        self.speed[free] = generator.integers(RAIN_SPEED[0], RAIN_SPEED[1] + 1, amount)
+        self.age[free] = 0
+        self.lifetime[free] = generator.integers(RAIN_LIFETIME[0], RAIN_LIFETIME[1] + 1, amount) / 1000
+        self.frame[free] = generator.integers(0, len(self.frames), amount)
 
     def update(self, dt):
-        # Movement
+        self.age[self.alive] += dt
+        self.alive &= self.age < self.lifetime
         if self.moving:
-            self.position += self.direction * self.speed * dt
-            self.rect.topleft = (round(self.position.x), round(self.position.y))
+            self.previous_position[:] = self.position
+            self.position[self.alive] += np.array(RAIN_DIRECTION, dtype = np.float32) * self.speed[self.alive, None] * dt
 
-        # Timer
-        if pygame.time.get_ticks() - self.start_time >= self.lifetime:
-            self.kill()
+    def blits(self, camera_rect, alpha = 1):
+        indices = np.flatnonzero(self.alive)
+        position = self.position[indices]
+        if self.moving and alpha < 1:
+            previous_position = self.previous_position[indices]
+            position = previous_position + (position - previous_position) * alpha
+        x, y = (np.round(position) - camera_rect.topleft).astype(int).T.tolist()
+        frames = self.frames
+        return [(frames[frame], position) for frame, position in zip(self.frame[indices].tolist(), zip(x, y))]
 
 class Rain:
-    def __init__(self, all_sprites):
+    def __init__(self, all_sprites, world_rect):
         self.all_sprites = all_sprites
         self.rain_drops = import_folder('./graphics/rain/drops/')
         self.rain_floor = import_folder('./graphics/rain/floor/')
-        self.floor_w, self.floor_h = pygame.image.load('./graphics/world/ground.png').get_size()
-
-    def create_floor(self):
-        Drop(
-            surface = choice(self.rain_floor), 
-            position = (randint(0, self.floor_w), randint(0, self.floor_h)), 
-            moving = False, 
-            groups = self.all_sprites, 
-            z = LAYERS['rain floor'])
-
-    def create_drops(self):
-        Drop(
-            surface = choice(self.rain_drops), 
-            position = (randint(0, self.floor_w), randint(0, self.floor_h)), 
-            moving = True, 
-            groups = self.all_sprites, 
-            z = LAYERS['rain drops'])
-
-    def update(self):
-        self.create_floor()
-        self.create_drops()
\ No newline at end of file
+        self.floor_rect = world_rect
+
+        # Pools drawn by the camera in the rain layers
+        self.floor = DropPool(self.rain_floor, LAYERS['rain floor'], RAIN_CAPACITY, moving = False)
+        self.drops = DropPool(self.rain_drops, LAYERS['rain drops'], RAIN_CAPACITY, moving = True)
+        for pool in (self.floor, self.drops):
+            all_sprites.add_renderer(pool.z, pool)
+        self.emit_amount = 0
+
+    def spawn_area(self, moving):
+        # Drops only spawn around the camera, falling ones also up and right of it
+        area = self.all_sprites.camera_rect.copy()
+        if moving:
+            distance = RAIN_SPEED[1] * RAIN_LIFETIME[1] / 1000
+            travel_x = int(-RAIN_DIRECTION[0] * distance)
+            travel_y = int(RAIN_DIRECTION[1] * distance)
+            area.width += travel_x
+            area.top -= travel_y
+            area.height += travel_y
+        return area.clip(self.floor_rect)
+
+    def update(self, dt, raining = True):
+        self.floor.update(dt)
+        self.drops.update(dt)
+
+        if raining:
+            self.emit_amount += RAIN_EMISSION_RATE * dt
+            amount = int(self.emit_amount)
+            self.emit_amount -= amount
+            if amount:
+                self.floor.emit(amount, self.spawn_area(False), rng.effects)
+                self.drops.emit(amount, self.spawn_area(True), rng.effects)
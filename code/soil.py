@@ -1,8 +1,46 @@
 import pygame
+import numpy as np
 from settings import *
-from pytmx.util_pygame import load_pygame
+from tilemap import load_map
 from support import *
-from random import choice
+from rng import rng
+from animation import get_animation
+from crops import CropField
+from sprites import InteractionGroup
+
+# Soil grid flags
+FARMABLE = np.uint8(1)
+TILLED = np.uint8(2)
+WATERED = np.uint8(4)
+PLANTED = np.uint8(8)
+
+# Adjacent soil tiles as bits
+SOIL_NEIGHBOURS = {
+    1: (0, -1), # Top
+    2: (1, 0),  # Right
+    4: (0, 1),  # Bottom
+    8: (-1, 0)  # Left
+}
+
+# Soil graphic for every combination of adjacent soil tiles
+SOIL_TILE_TYPES = {
+    0: 'o',
+    1: 'b',    # Top
+    2: 'l',    # Right
+    3: 'bl',   # Top, right
+    4: 't',    # Bottom
+    5: 'tb',   # Top, bottom
+    6: 'tl',   # Right, bottom
+    7: 'tbr',  # Top, right, bottom
+    8: 'r',    # Left
+    9: 'br',   # Top, left
+    10: 'lr',  # Right, left
+    11: 'lrb', # Top, right, left
+    12: 'tr',  # Bottom, left
+    13: 'tbl', # Top, bottom, left
+    14: 'lrt', # Right, bottom, left
+    15: 'x'
+}
 
 class SoilTile(pygame.sprite.Sprite):
     def __init__(self, position, surface, groups):
@@ -11,200 +49,281 @@ class SoilTile(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(topleft = position)
         self.z = LAYERS['soil']
 
-class WaterTile(pygame.sprite.Sprite):
-    def __init__(self, position, surface, groups):
-        super().__init__(groups)
-        self.image = surface
-        self.rect = self.image.get_rect(topleft = position)
+class SoilWaterLayer:
+    def __init__(self, soil_layer):
+        # Watered tiles are drawn straight from the soil grid, there is no sprite per tile
+        self.soil_layer = soil_layer
         self.z = LAYERS['soil water']
 
+    def blits(self, camera_rect, alpha = 1):
+        soil_layer = self.soil_layer
+        rows, cols = soil_layer.grid.shape
+        left = max(0, camera_rect.left // TILE_SIZE)
+        top = max(0, camera_rect.top // TILE_SIZE)
+        right = min(cols, (camera_rect.right - 1) // TILE_SIZE + 1)
+        bottom = min(rows, (camera_rect.bottom - 1) // TILE_SIZE + 1)
+        if left >= right or top >= bottom:
+            return []
+
+        tile_rows, tile_cols = np.nonzero(soil_layer.grid[top:bottom, left:right] & WATERED)
+        variants = soil_layer.water_variants[top:bottom, left:right][tile_rows, tile_cols]
+        x = ((tile_cols + left) * TILE_SIZE - camera_rect.x).tolist()
+        y = ((tile_rows + top) * TILE_SIZE - camera_rect.y).tolist()
+        surfaces = soil_layer.water_surfaces
+        return [(surfaces[variant], position) for variant, position in zip(variants.tolist(), zip(x, y))]
+
 class Plant(pygame.sprite.Sprite):
-    def __init__(self, plant_type,  groups, soil, check_watered):
+    def __init__(self, tile, plant_type, groups):
         super().__init__(groups)
-        
-        # Setup
+
+        # Setup, the growth itself is kept by the crop field
+        self.tile = tile
         self.plant_type = plant_type
-        self.frames = import_folder(f'./graphics/fruit/{plant_type}')
-        self.soil = soil
-        self.check_watered = check_watered
-        
-        # Plant growth
-        self.age = 0
-        self.max_age = len(self.frames) - 1
-        self.grow_speed = GROW_SPEED[plant_type]
-        self.harvestable = False
-
-        # Sprite
-        self.image = self.frames[self.age]
+        self.animation = get_animation(f'./graphics/fruit/{plant_type}', loop = False)
+        self.soil_rect = pygame.Rect(tile[0] * TILE_SIZE, tile[1] * TILE_SIZE, TILE_SIZE, TILE_SIZE)
         self.y_offset = -16 if plant_type == 'corn' else -8
-        self.rect = self.image.get_rect(midbottom = soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
-        self.z = LAYERS['ground plant']
-    
-    def grow(self):
-      if self.check_watered(self.rect.center):
-        self.age += self.grow_speed
+        self.set_age(0, False)
+
+    def set_age(self, age, harvestable):
+        self.age = age
+        self.harvestable = harvestable
 
-        if int(self.age) > 0:
+        self.image = self.animation.frame(age)
+        self.rect = self.image.get_rect(midbottom = self.soil_rect.midbottom + pygame.math.Vector2(0, self.y_offset))
+        if int(age) > 0:
             self.z = LAYERS['main']
             self.hitbox = self.rect.copy().inflate(-26, -self.rect.height * 0.4)
-
-        if self.age >= self.max_age:
-            self.age = self.max_age
-            self.harvestable = True
-
-        self.image = self.frames[int(self.age)]
-        self.rect = self.image.get_rect(midbottom = self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))
+        else:
+            self.z = LAYERS['ground plant']
 
 class SoilLayer:
-    def __init__(self, all_sprites, collision_sprites):
+    def __init__(self, all_sprites, collision_sprites, map_path = MAP_PATH):
 
         # Sprite groups
         self.all_sprites = all_sprites
         self.collision_sprites = collision_sprites
         self.soil_sprites = pygame.sprite.Group()
-        self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
+        self.harvestable_sprites = InteractionGroup()
+
+        # Sprites by tile coordinate, plants only for the crops around the player
+        self.soil_tiles = {}
+        self.plants = {}
+        self.visible_area = None
 
         # Graphics
         self.soil_surfaces = import_folder_dict('./graphics/soil/')
         self.water_surfaces = import_folder('./graphics/soil_water/')
+        max_ages = {}
+        for plant_type in GROW_SPEED:
+            # Decoded up front so sowing never touches the disk
+            max_ages[plant_type] = len(import_folder(f'./graphics/fruit/{plant_type}')) - 1
 
-        self.create_soil_grid()
+        self.create_soil_grid(map_path)
         self.create_hit_rect()
+        self.crops = CropField(self.grid.shape, max_ages)
+
+        # Puddle graphic of every watered tile, drawn by the water layer
+        self.water_variants = np.zeros(self.grid.shape, dtype = np.uint8)
+        self.water_layer = SoilWaterLayer(self)
 
         # Sounds
-        self.hoe_sound = pygame.mixer.Sound('./audio/hoe.wav')
+        self.hoe_sound = load_sound('./audio/hoe.wav')
         self.hoe_sound.set_volume(0.1)
 
-        self.plant_sound = pygame.mixer.Sound('./audio/plant.wav')
+        self.plant_sound = load_sound('./audio/plant.wav')
         self.plant_sound.set_volume(0.2)
 
-    def create_soil_grid(self):
-        ground = pygame.image.load('./graphics/world/ground.png')
-        h_tiles = ground.get_width() // TILE_SIZE
-        v_tiles = ground.get_height() // TILE_SIZE
+    def create_soil_grid(self, map_path):
+        tmx_data = load_map(map_path)
+        self.grid = np.zeros((tmx_data.height, tmx_data.width), dtype = np.uint8)
+        for x, y, _ in tmx_data.get_layer_by_name('Farmable').tiles():
+            self.grid[y, x] |= FARMABLE
 
-        self.grid = [[[] for _ in range(h_tiles)] for _ in range(v_tiles)]
-        for x, y, _ in load_pygame('./data/map.tmx').get_layer_by_name('Farmable').tiles():
-            self.grid[y][x].append('F')
+    # Grid access
+    def has_flag(self, x, y, flag):
+        return bool(self.grid[y, x] & flag)
+
+    def add_flag(self, x, y, flag):
+        self.grid[y, x] |= flag
+
+    def remove_flag(self, x, y, flag):
+        self.grid[y, x] &= ~flag
+
+    def get_tiles(self, mask):
+        # (x, y) of every cell in the mask, row by row
+        rows, cols = np.nonzero(mask)
+        return list(zip(cols.tolist(), rows.tolist()))
     
     def create_hit_rect(self):
-        self.hit_rects = []
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-                    self.hit_rects.append(rect)
+        self.hit_rects = [pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE) for x, y in self.get_tiles(self.grid & FARMABLE)]
+
+    def get_tile(self, point):
+        x = int(point[0] // TILE_SIZE)
+        y = int(point[1] // TILE_SIZE)
+        rows, cols = self.grid.shape
+        if 0 <= y < rows and 0 <= x < cols:
+            return x, y
 
     def get_hit(self, point):
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):
-                self.hoe_sound.play()
+        tile = self.get_tile(point)
+        if tile and self.has_flag(*tile, FARMABLE):
+            self.hoe_sound.play()
 
-                x = rect.x // TILE_SIZE
-                y = rect.y // TILE_SIZE
+            if not self.has_flag(*tile, TILLED):
+                self.add_flag(*tile, TILLED)
+                self.update_soil_area(*tile)
+                if self.raining: 
+                    self.water_all()
 
-                if 'F' in self.grid[y][x]:
-                    self.grid[y][x].append('X')
-                    self.create_soil_tiles()
-                    if self.raining: 
-                        self.water_all()
+    def pick_water_variants(self, mask):
+        # Puddle graphics are an effect, so they come from the effects stream and never change gameplay
+        self.water_variants[mask] = rng.effects.integers(len(self.water_surfaces), size = np.count_nonzero(mask))
 
     def water(self, target_position):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_position):
-                
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
-                self.grid[y][x].append('W')
-
-                position = soil_sprite.rect.topleft
-                surface = choice(self.water_surfaces)
-                WaterTile(position, surface, [self.all_sprites, self.water_sprites])
+        tile = self.get_tile(target_position)
+        if tile and self.has_flag(*tile, TILLED) and not self.has_flag(*tile, WATERED):
+            self.add_flag(*tile, WATERED)
+            self.water_variants[tile[1], tile[0]] = rng.effects.integers(len(self.water_surfaces))
 
     def water_all(self):
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell and 'W' not in cell:
-                    cell.append('W')
-                    x = index_col * TILE_SIZE
-                    y = index_row * TILE_SIZE
-                    WaterTile((x, y), choice(self.water_surfaces), [self.all_sprites, self.water_sprites])
+        dry = (self.grid & (TILLED | WATERED)) == TILLED
+        self.grid[dry] |= WATERED
+        self.pick_water_variants(dry)
     
     def remove_water(self):
-        for sprite in self.water_sprites.sprites():
-            sprite.kill()
-
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')
-    
-    def check_watered(self, position):
-        x = position[0] // TILE_SIZE
-        y = position[1] // TILE_SIZE
-        cell = self.grid[y][x]
-        is_watered = 'W' in cell
-        return is_watered
+        self.grid &= ~WATERED
     
     def plant_seed(self, target_position, seed):
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_position):
-                self.plant_sound.play()
+        tile = self.get_tile(target_position)
+        if tile in self.soil_tiles:
+            self.plant_sound.play()
+
+            if not self.has_flag(*tile, PLANTED):
+                self.add_flag(*tile, PLANTED)
+                self.crops.add(tile, seed)
+                if self.is_visible(tile):
+                    self.create_plant(tile)
 
-                x = soil_sprite.rect.x // TILE_SIZE
-                y = soil_sprite.rect.y // TILE_SIZE
+    def remove_plant(self, plant):
+        self.remove_crop(plant.tile)
 
-                if 'P' not in self.grid[y][x]:
-                    self.grid[y][x].append('P')
-                    Plant(seed, [self.all_sprites, self.plant_sprites, self.collision_sprites], soil_sprite, self.check_watered)
+    def remove_crop(self, tile):
+        self.remove_flag(*tile, PLANTED)
+        self.crops.remove(tile)
+        if tile in self.plants:
+            self.plants.pop(tile).kill()
 
     def update_plants(self):
+        # One day of growth for the whole field, then the few plant sprites catch up
+        self.crops.grow((self.grid & WATERED).astype(bool))
+        for plant in self.plants.values():
+            self.refresh_plant(plant)
+
+    # Plant sprites
+    def create_plant(self, tile):
+        plant_type, age, harvestable = self.crops.get(tile)
+        self.plants[tile] = Plant(tile, plant_type, [self.all_sprites, self.plant_sprites, self.collision_sprites])
+        self.refresh_plant(self.plants[tile])
+
+    def refresh_plant(self, plant):
+        plant_type, age, harvestable = self.crops.get(plant.tile)
+        plant.set_age(age, harvestable)
+        self.collision_sprites.refresh(plant)
+
+        # Only ripe plants can be picked, they join the index the moment they ripen
+        if harvestable:
+            if plant in self.harvestable_sprites:
+                self.harvestable_sprites.refresh(plant)
+            else:
+                self.harvestable_sprites.add(plant)
+
+    def is_visible(self, tile):
+        if self.visible_area is None:
+            return False
+        left, top, right, bottom = self.visible_area
+        return left <= tile[0] < right and top <= tile[1] < bottom
+
+    def update_visible(self, rect):
+        # Crops only get sprites within a margin around the rect, the view follows the player
+        area = rect.inflate(PLANT_MARGIN * 2, PLANT_MARGIN * 2)
+        visible_area = (area.left // TILE_SIZE, area.top // TILE_SIZE, area.right // TILE_SIZE + 1, area.bottom // TILE_SIZE + 1)
+        if visible_area == self.visible_area:
+            return
+        self.visible_area = visible_area
+
+        visible = self.crops.tiles_in(*visible_area)
+        visible_set = set(visible)
+        for tile in [tile for tile in self.plants if tile not in visible_set]:
+            self.plants.pop(tile).kill()
+        for tile in visible:
+            if tile not in self.plants:
+                self.create_plant(tile)
+
+    def clear_plants(self):
         for plant in self.plant_sprites.sprites():
-            plant.grow()
+            plant.kill()
+        self.plants.clear()
+        self.grid &= ~PLANTED
+        self.crops.clear()
     
+    def restore(self, grid, crops):
+        # A saved field in one go, plant sprites follow on the next update_visible
+        self.clear_plants()
+        self.grid[:] = grid
+        self.crops.load(crops)
+        self.create_soil_tiles()
+        self.pick_water_variants((self.grid & WATERED).astype(bool))
+        self.visible_area = None
+
     def create_soil_tiles(self):
-        self.soil_sprites.empty()
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:
-
-                    # Check for adjacent soil tiles
-                    top = 'X' in self.grid[index_row - 1][index_col]
-                    bottom = 'X' in self.grid[index_row + 1][index_col]
-                    right = 'X' in row[index_col + 1]
-                    left = 'X' in row[index_col - 1]
-
-                    tile_type = 'o'
-
-                    # All sides are soil
-                    if all((top, bottom, right, left)): tile_type = 'x'
-
-                    # Horizontal soil
-                    if left and not any((top, right, bottom)): tile_type = 'r'
-                    if right and not any((top, left, bottom)): tile_type = 'l'
-                    if right and left and not any((top, bottom)): tile_type = 'lr'
-
-                    # Vertical soil
-                    if top and not any((left, right, bottom)): tile_type = 'b'
-                    if bottom and not any((top, left, right)): tile_type = 't'
-                    if top and bottom and not any((left, right)): tile_type = 'tb'
-
-                    # Corners
-                    if left and bottom and not any((top, right)): tile_type = 'tr'
-                    if right and bottom and not any((top, left)): tile_type = 'tl'
-                    if left and top and not any((right, bottom)): tile_type = 'br'
-                    if right and top and not any((left, bottom)): tile_type = 'bl'
-
-                    # T shaped
-                    if all((top, bottom, right)) and not left: tile_type = 'tbr'
-                    if all((top, bottom, left)) and not right: tile_type = 'tbl'
-                    if all((left, right, top)) and not bottom: tile_type = 'lrb'
-                    if all((left, right, bottom)) and not top: tile_type = 'lrt'
-
-                    SoilTile(
-                        position = (index_col * TILE_SIZE, index_row * TILE_SIZE), 
-                        surface = self.soil_surfaces[tile_type], 
-                        groups = [self.all_sprites, self.soil_sprites])
\ No newline at end of file
+        for sprite in self.soil_sprites.sprites():
+            sprite.kill()
+        self.soil_tiles.clear()
+
+        # The graphic of every tile at once from the shifted soil mask, the same one update_soil_tile picks
+        tilled = (self.grid & TILLED).astype(bool)
+        rows, cols = tilled.shape
+        padded = np.pad(tilled, 1)
+        neighbours = np.zeros(tilled.shape, dtype = np.uint8)
+        for bit, (offset_x, offset_y) in SOIL_NEIGHBOURS.items():
+            neighbours[padded[1 + offset_y:1 + offset_y + rows, 1 + offset_x:1 + offset_x + cols]] |= bit
+
+        tile_rows, tile_cols = np.nonzero(tilled)
+        for x, y, tile_type in zip(tile_cols.tolist(), tile_rows.tolist(), neighbours[tile_rows, tile_cols].tolist()):
+            self.soil_tiles[(x, y)] = SoilTile(
+                position = (x * TILE_SIZE, y * TILE_SIZE), 
+                surface = self.soil_surfaces[SOIL_TILE_TYPES[tile_type]], 
+                groups = [self.all_sprites, self.soil_sprites])
+
+    def update_soil_tile(self, x, y):
+        rows, cols = self.grid.shape
+        if not (0 <= y < rows and 0 <= x < cols):
+            return
+
+        if not self.has_flag(x, y, TILLED):
+            if (x, y) in self.soil_tiles:
+                self.soil_tiles.pop((x, y)).kill()
+            return
+
+        # Pick the graphic from the adjacent soil tiles
+        neighbours = 0
+        for bit, (offset_x, offset_y) in SOIL_NEIGHBOURS.items():
+            neighbour_x, neighbour_y = x + offset_x, y + offset_y
+            if 0 <= neighbour_y < rows and 0 <= neighbour_x < cols and self.has_flag(neighbour_x, neighbour_y, TILLED):
+                neighbours |= bit
+        surface = self.soil_surfaces[SOIL_TILE_TYPES[neighbours]]
+
+        if (x, y) in self.soil_tiles:
+            self.soil_tiles[(x, y)].image = surface
+        else:
+            self.soil_tiles[(x, y)] = SoilTile(
+                position = (x * TILE_SIZE, y * TILE_SIZE), 
+                surface = surface, 
+                groups = [self.all_sprites, self.soil_sprites])
+
+    def update_soil_area(self, x, y):
+        # Only the changed tile and its neighbours can change graphic
+        self.update_soil_tile(x, y)
+        for offset_x, offset_y in SOIL_NEIGHBOURS.values():
+            self.update_soil_tile(x + offset_x, y + offset_y)
\ No newline at end of file
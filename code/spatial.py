@@ -0,0 +1,50 @@
+from settings import *
+
+class SpatialHash:
+    def __init__(self, cell_size = TILE_SIZE * 4):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, item, rect):
+        bounds = self.cell_range(rect)
+        self.item_cells[item] = bounds
+        left, top, right, bottom = bounds
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                self.cells.setdefault((x, y), set()).add(item)
+
+    def remove(self, item):
+        left, top, right, bottom = self.item_cells.pop(item)
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                cell = self.cells[(x, y)]
+                cell.discard(item)
+                if not cell:
+                    del self.cells[(x, y)]
+
+    def move(self, item, rect):
+        # Only touch the cells when the rect crossed a cell border
+        if self.item_cells.get(item) != self.cell_range(rect):
+            self.remove(item)
+            self.insert(item, rect)
+
+    def query(self, rect):
+        left, top, right, bottom = self.cell_range(rect)
+        found = set()
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return found
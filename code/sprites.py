@@ -1,7 +1,65 @@
 import pygame
 from settings import *
-from random import randint, choice
-from timer import Timer
+from timer import Timer, scheduler
+from support import load_image, load_sound
+from spatial import SpatialHash
+from itertools import count
+from rng import rng
+
+class IndexedGroup(pygame.sprite.Group):
+    def __init__(self):
+        super().__init__()
+
+        # Broadphase: rects indexed by tile, results kept in group order
+        self.rect_index = SpatialHash(TILE_SIZE)
+        self.sprite_order = {}
+        self.new_sprites = {}
+        self.order_counter = count()
+
+    def indexed_rect(self, sprite):
+        return sprite.rect
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        # Sprites are added before their rects exist, so they are only queued here
+        self.sprite_order[sprite] = next(self.order_counter)
+        self.new_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        del self.sprite_order[sprite]
+        if sprite in self.rect_index:
+            self.rect_index.remove(sprite)
+        self.new_sprites.pop(sprite, None)
+
+    def refresh(self, sprite):
+        # Has to be called whenever the indexed rect of a sprite changes
+        self.new_sprites.pop(sprite, None)
+        if sprite in self.rect_index:
+            self.rect_index.remove(sprite)
+        rect = self.indexed_rect(sprite)
+        if rect is not None:
+            self.rect_index.insert(sprite, rect)
+
+    def query(self, rect):
+        # Every sprite in the cells around rect, some may not touch it
+        for sprite in list(self.new_sprites):
+            self.refresh(sprite)
+        return sorted(self.rect_index.query(rect), key = self.sprite_order.__getitem__)
+
+    def colliding(self, rect):
+        return [sprite for sprite in self.query(rect) if self.indexed_rect(sprite).colliderect(rect)]
+
+    def at_point(self, point):
+        return [sprite for sprite in self.query(pygame.Rect(point, (1, 1))) if self.indexed_rect(sprite).collidepoint(point)]
+
+class CollisionGroup(IndexedGroup):
+    def indexed_rect(self, sprite):
+        # Sprites without a hitbox are not solid yet
+        return getattr(sprite, 'hitbox', None)
+
+class InteractionGroup(IndexedGroup):
+    pass
 
 class Generic(pygame.sprite.Sprite):
     def __init__(self, position, surface, groups, z = LAYERS['main']):
@@ -17,29 +75,6 @@ class Interaction(Generic):
         super().__init__(position, surface, groups)
         self.name = name
 
-class Water(Generic):
-    def __init__(self, position, frames, groups):
-        
-        # Animation setup
-        self.frames = frames
-        self.frame_index = 0
-
-        # Sprite setup
-        super().__init__(
-            position = position, 
-            surface = self.frames[self.frame_index], 
-            groups =  groups, 
-            z = LAYERS['water'])
-        
-    def animate(self, dt):
-        self.frame_index += 5 * dt
-        if self.frame_index >= len(self.frames):
-            self.frame_index = 0
-        self.image = self.frames[int(self.frame_index)]
-
-    def update(self, dt):
-        self.animate(dt)
-
 class WildFlower(Generic):
     def __init__(self, position, surface, groups):
         super().__init__(position, surface, groups)
@@ -48,8 +83,7 @@ class WildFlower(Generic):
 class Particle(Generic):
     def __init__(self, position, surface, groups, z, duration = 200):
         super().__init__(position, surface, groups, z)
-        self.start_time = pygame.time.get_ticks()
-        self.duration = duration
+        scheduler.schedule(duration, self.kill)
 
         # White surface
         mask_surface = pygame.mask.from_surface(self.image)
@@ -57,23 +91,22 @@ class Particle(Generic):
         new_surface.set_colorkey((0, 0, 0))
         self.image = new_surface
 
-    def update(self, dt):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time > self.duration:
-            self.kill()
 
 class Tree(Generic):
     def __init__(self, position, surface, groups, name, player_add):
         super().__init__(position, surface, groups)
 
+        # Apples and particles go to the first group, the order of self.groups() is not fixed
+        self.all_sprites = groups[0]
+
         # Tree atrributes
         self.health = 5
         self.alive = True
         stump_path = f'./graphics/stumps/{"small" if name == "Small" else "large"}.png'
-        self.stump_surface = pygame.image.load(stump_path).convert_alpha()
+        self.stump_surface = load_image(stump_path)
 
         # Apples
-        self.apple_surface = pygame.image.load('./graphics/fruit/apple.png')
+        self.apple_surface = load_image('./graphics/fruit/apple.png')
         self.apple_position = APPLE_POSITION[name]
         self.apple_sprites = pygame.sprite.Group()
         self.create_fruits()
@@ -81,7 +114,7 @@ class Tree(Generic):
         self.player_add = player_add
 
         # Sounds
-        self.axe_sound = pygame.mixer.Sound('./audio/axe.mp3')
+        self.axe_sound = load_sound('./audio/axe.mp3')
 
     def damage(self):
         
@@ -93,11 +126,11 @@ class Tree(Generic):
         
         # Remove an apple
         if len(self.apple_sprites.sprites()) > 0:
-            random_apple = choice(self.apple_sprites.sprites())
+            random_apple = rng.choice(self.apple_sprites.sprites())
             Particle(
                 position = random_apple.rect.topleft, 
                 surface = random_apple.image, 
-                groups = self.groups()[0], 
+                groups = self.all_sprites, 
                 z = LAYERS['fruit'])
             self.player_add('apple')
             random_apple.kill()
@@ -107,27 +140,46 @@ class Tree(Generic):
             Particle(
                 position = self.rect.topleft,
                 surface = self.image,
-                groups = self.groups()[0],
+                groups = self.all_sprites,
                 z = LAYERS['fruit'],
                 duration = 300
             )
-            self.image = self.stump_surface
-            self.rect = self.image.get_rect(midbottom = self.rect.midbottom)
-            self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
-            self.alive = False
+            self.create_stump()
             self.player_add('wood')
 
+    def create_stump(self):
+        self.image = self.stump_surface
+        self.rect = self.image.get_rect(midbottom = self.rect.midbottom)
+        self.hitbox = self.rect.copy().inflate(-10, -self.rect.height * 0.6)
+        for group in self.groups():
+            if isinstance(group, IndexedGroup):
+                group.refresh(self)
+        self.alive = False
+
+    def restore(self, health, alive, apple_offsets):
+        # Saved state, apples are given relative to the top left of the tree or stump
+        self.health = health
+        if self.alive and not alive:
+            self.create_stump()
+        for apple in self.apple_sprites.sprites():
+            apple.kill()
+        for x, y in apple_offsets:
+            self.create_fruit((self.rect.left + x, self.rect.top + y))
+
     def update(self, dt):
         if self.alive:
             self.check_death()
 
     def create_fruits(self):
         for position in self.apple_position:
-            if randint(0, 10) < 2:
+            if rng.randint(0, 10) < 2:
                 x = position[0] + self.rect.left
                 y = position[1] + self.rect.top
-                Generic(
-                    position = (x, y), 
-                    surface = self.apple_surface, 
-                    groups = [self.apple_sprites, self.groups()[0]],
-                    z = LAYERS['fruit'])
\ No newline at end of file
+                self.create_fruit((x, y))
+
+    def create_fruit(self, position):
+        Generic(
+            position = position, 
+            surface = self.apple_surface, 
+            groups = [self.apple_sprites, self.all_sprites],
+            z = LAYERS['fruit'])
\ No newline at end of file
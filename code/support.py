@@ -1,24 +1,170 @@
-from os import walk
+from os import walk, path as os_path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
 import pygame
+from settings import *
 
-def import_folder(path):
-    surface_list = []
+class AssetRegistry:
+    def __init__(self, max_frame_sets = None):
+        # Every asset is decoded once and shared by path
+        self.images = {}
+        self.sounds = {}
 
-    for _, _, img_files in walk(path):
-        for image in img_files:
-            full_path = path + '/' + image
-            image_surface = pygame.image.load(full_path).convert_alpha()   
-            surface_list.append(image_surface)
+        # Frame sets can optionally be evicted, least recently used first
+        self.frame_sets = OrderedDict()
+        self.max_frame_sets = max_frame_sets
 
-    return surface_list
+        # Animations playing a frame set, evicted together with it
+        self.animations = {}
 
-def import_folder_dict(path):
-    surface_dict = {}
+        # Surfaces finished by the AssetLoader, handed out on first use
+        self.preloaded = {}
+        self.timings = {}
+
+    def load_surface(self, path):
+        key = os_path.normpath(path)
+        if key in self.preloaded:
+            return self.preloaded.pop(key)
+        return pygame.image.load(key).convert_alpha()
+
+    def image(self, path):
+        key = os_path.normpath(path)
+        if key not in self.images:
+            self.images[key] = self.load_surface(key)
+        return self.images[key]
+
+    def sound(self, path):
+        key = os_path.normpath(path)
+        if key not in self.sounds:
+            self.sounds[key] = pygame.mixer.Sound(key)
+        return self.sounds[key]
+
+    def frames(self, path, as_dict = False):
+        key = (os_path.normpath(path), as_dict)
+        if key in self.frame_sets:
+            self.frame_sets.move_to_end(key)
+            return self.frame_sets[key]
+
+        frames = {} if as_dict else []
+        for _, _, img_files in walk(path):
+            for image in img_files:
+                full_path = path + '/' + image
+                image_surface = self.load_surface(full_path)
+                if as_dict:
+                    frames[image.split('.')[0]] = image_surface
+                else:
+                    frames.append(image_surface)
+            if as_dict:
+                break
+
+        self.frame_sets[key] = frames
+        if self.max_frame_sets is not None and len(self.frame_sets) > self.max_frame_sets:
+            evicted, _ = self.frame_sets.popitem(last = False)
+            self.animations.pop(evicted, None)
+        return frames
+
+    def report(self):
+        # Slowest assets first, in ms
+        lines = []
+        for path, (decode_time, finalize_time) in sorted(self.timings.items(), key = lambda item: -sum(item[1])):
+            lines.append(f'{path}: decode {decode_time * 1000:.1f} ms, finalize {finalize_time * 1000:.1f} ms')
+        return lines
+
+def decode_asset(kind, path):
+    # Runs on a worker thread, so nothing here may touch the display
+    start = perf_counter()
+    asset = pygame.image.load(path) if kind == 'image' else pygame.mixer.Sound(path)
+    return asset, perf_counter() - start
+
+class AssetLoader:
+    def __init__(self, registry, image_paths, sound_paths, workers = None):
+        self.registry = registry
+        self.workers = workers
+
+        # Folders are expanded to every file inside them
+        self.jobs = []
+        for kind, paths in (('image', image_paths), ('sound', sound_paths)):
+            for path in paths:
+                if os_path.isdir(path):
+                    for folder, _, files in walk(path):
+                        self.jobs.extend((kind, os_path.normpath(os_path.join(folder, file))) for file in files)
+                elif os_path.exists(path):
+                    self.jobs.append((kind, os_path.normpath(path)))
+
+        self.pending = {}
+        self.loaded = 0
+
+    @property
+    def progress(self):
+        return self.loaded / len(self.jobs) if self.jobs else 1
 
-    for _, _, img_files in walk(path):
-        for image in img_files:
-            full_path = path + '/' + image
-            image_surface = pygame.image.load(full_path).convert_alpha()   
-            surface_dict[image.split('.')[0]] = image_surface
+    @property
+    def done(self):
+        return self.loaded == len(self.jobs)
 
-        return surface_dict
\ No newline at end of file
+    def start(self):
+        self.executor = ThreadPoolExecutor(self.workers)
+        for kind, path in self.jobs:
+            self.pending[self.executor.submit(decode_asset, kind, path)] = (kind, path)
+
+    def update(self):
+        # Finalize the decoded assets on the main thread, convert_alpha needs the display
+        for future in [future for future in self.pending if future.done()]:
+            kind, path = self.pending.pop(future)
+            asset, decode_time = future.result()
+
+            start = perf_counter()
+            if kind == 'image':
+                self.registry.preloaded[path] = asset.convert_alpha()
+            else:
+                self.registry.sounds[path] = asset
+            self.registry.timings[path] = (decode_time, perf_counter() - start)
+            self.loaded += 1
+
+        if self.done:
+            self.executor.shutdown()
+
+class TextCache:
+    def __init__(self, max_size = TEXT_CACHE_SIZE):
+        # Fonts by path and size, rendered strings least recently used first
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, path, size):
+        key = (os_path.normpath(path), size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.Font(key[0], size)
+        return self.fonts[key]
+
+    def render(self, font, text, color, antialias = False):
+        key = (font, text, color, antialias)
+        if key in self.surfaces:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last = False)
+        return surface
+
+assets = AssetRegistry()
+text_cache = TextCache()
+
+def load_image(path):
+    return assets.image(path)
+
+def load_sound(path):
+    return assets.sound(path)
+
+def import_folder(path):
+    return assets.frames(path)
+
+def import_folder_dict(path):
+    return assets.frames(path, as_dict = True)
\ No newline at end of file
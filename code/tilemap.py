@@ -0,0 +1,155 @@
+import pygame
+import numpy as np
+import pickle
+from os import makedirs, path as os_path
+from hashlib import sha1
+from support import load_image
+
+CACHE_VERSION = 2
+CACHE_FOLDER = './data/cache'
+ATLAS_WIDTH = 1024
+
+class MapObject:
+    def __init__(self, name, x, y, width, height, image):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.image = image
+
+class TileLayer:
+    def __init__(self, name, indices, images):
+        self.name = name
+        self.indices = indices
+        self.images = images
+
+    def tiles(self):
+        rows, cols = np.nonzero(self.indices)
+        for x, y, index in zip(cols.tolist(), rows.tolist(), self.indices[rows, cols].tolist()):
+            yield x, y, self.images[index]
+
+class CompiledMap:
+    def __init__(self, data):
+        # Every tile and object image is a subsurface of one atlas
+        atlas = load_image(data['atlas'])
+        images = [None] + [atlas.subsurface(rect) for rect in data['atlas_rects']]
+
+        self.width = data['width']
+        self.height = data['height']
+        self.layers = {}
+        for name, indices in data['tile_layers'].items():
+            self.layers[name] = TileLayer(name, indices, images)
+        for name, objects in data['object_layers'].items():
+            self.layers[name] = [MapObject(*values[:-1], images[values[-1]]) for values in objects]
+
+    def get_layer_by_name(self, name):
+        return self.layers[name]
+
+def file_hash(file_path):
+    with open(file_path, 'rb') as file:
+        return sha1(file.read()).hexdigest()
+
+def cache_paths(file_path):
+    # Named after the map and a hash of its full path, so maps with the same file name never share a cache
+    source = os_path.abspath(file_path)
+    name = os_path.splitext(os_path.basename(source))[0]
+    digest = sha1(source.encode()).hexdigest()[:12]
+    return f'{CACHE_FOLDER}/{name}_{digest}.cache', f'{CACHE_FOLDER}/{name}_{digest}_atlas.png'
+
+def atlas_path(file_path):
+    return cache_paths(file_path)[1]
+
+def compile_map(file_path, cache_path, atlas_path, mtime, content_hash):
+    # pytmx is only needed when the cache is cold
+    from pytmx.util_pygame import load_pygame
+    from pytmx import TiledTileLayer
+
+    tmx_data = load_pygame(file_path)
+
+    # Pack every used image into the atlas, row by row
+    atlas_rects = []
+    atlas_indices = {}
+    x = y = row_height = 0
+    def add_image(gid):
+        nonlocal x, y, row_height
+        if not gid or tmx_data.images[gid] is None:
+            return 0
+        if gid not in atlas_indices:
+            width, height = tmx_data.images[gid].get_size()
+            if x + width > ATLAS_WIDTH:
+                x, y, row_height = 0, y + row_height, 0
+            atlas_rects.append(pygame.Rect(x, y, width, height))
+            atlas_indices[gid] = len(atlas_rects)
+            x += width
+            row_height = max(row_height, height)
+        return atlas_indices[gid]
+
+    tile_layers = {}
+    object_layers = {}
+    for layer in tmx_data.layers:
+        if isinstance(layer, TiledTileLayer):
+            indices = np.zeros((tmx_data.height, tmx_data.width), dtype = np.uint16)
+            for tile_x, tile_y, gid in layer.iter_data():
+                indices[tile_y, tile_x] = add_image(gid)
+            tile_layers[layer.name] = indices
+        else:
+            object_layers[layer.name] = [(obj.name, obj.x, obj.y, obj.width, obj.height, add_image(obj.gid)) for obj in layer]
+
+    atlas = pygame.Surface((ATLAS_WIDTH, max(y + row_height, 1)), pygame.SRCALPHA)
+    for gid, index in atlas_indices.items():
+        atlas.blit(tmx_data.images[gid], atlas_rects[index - 1])
+    pygame.image.save(atlas, atlas_path)
+
+    data = {
+        'version': CACHE_VERSION,
+        'source': os_path.abspath(file_path),
+        'mtime': mtime,
+        'hash': content_hash,
+        'width': tmx_data.width,
+        'height': tmx_data.height,
+        'atlas': atlas_path,
+        'atlas_rects': [tuple(rect) for rect in atlas_rects],
+        'tile_layers': tile_layers,
+        'object_layers': object_layers}
+    with open(cache_path, 'wb') as file:
+        pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+    return data
+
+def read_cache(cache_path, mtime, file_path):
+    if not os_path.exists(cache_path):
+        return None
+
+    # A truncated or corrupt cache, or one of an older version, is rebuilt like a missing one
+    try:
+        with open(cache_path, 'rb') as file:
+            data = pickle.load(file)
+        if data['version'] != CACHE_VERSION or data['source'] != os_path.abspath(file_path) or not os_path.exists(data['atlas']):
+            return None
+
+        if data['mtime'] != mtime and data['hash'] != file_hash(file_path):
+            return None
+    except (pickle.UnpicklingError, EOFError, KeyError):
+        return None
+
+    # A touched but unchanged map keeps its cache
+    if data['mtime'] != mtime:
+        data['mtime'] = mtime
+        with open(cache_path, 'wb') as file:
+            pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+    return data
+
+maps = {}
+
+def load_map(file_path):
+    key = os_path.normpath(file_path)
+    if key not in maps:
+        makedirs(CACHE_FOLDER, exist_ok = True)
+        cache_path, map_atlas_path = cache_paths(key)
+
+        mtime = os_path.getmtime(key)
+        data = read_cache(cache_path, mtime, key)
+        if data is None:
+            data = compile_map(key, cache_path, map_atlas_path, mtime, file_hash(key))
+        maps[key] = CompiledMap(data)
+    return maps[key]
@@ -1,4 +1,54 @@
-import pygame
+from heapq import heappush, heappop
+from itertools import count
+
+class SimulationClock:
+    def __init__(self):
+        # Milliseconds of simulated time, advanced by every fixed update step
+        self.time = 0
+
+    def advance(self, dt):
+        self.time += dt * 1000
+
+    def get_ticks(self):
+        return int(self.time)
+
+simulation_clock = SimulationClock()
+
+class Scheduler:
+    def __init__(self, clock):
+        self.clock = clock
+
+        # Min-heap of [deadline, order, callback], a cancelled event keeps its slot with no callback
+        self.events = []
+        self.order = count()
+
+    def __len__(self):
+        return len(self.events)
+
+    def schedule(self, delay, callback):
+        event = [self.clock.get_ticks() + delay, next(self.order), callback]
+        heappush(self.events, event)
+        return event
+
+    def cancel(self, event):
+        event[2] = None
+
+    def clear(self):
+        self.events.clear()
+
+    def update(self):
+        # Only the due events are touched, however many are waiting
+        now = self.clock.get_ticks()
+        events = self.events
+        fired = 0
+        while events and events[0][0] <= now:
+            callback = heappop(events)[2]
+            if callback:
+                callback()
+                fired += 1
+        return fired
+
+scheduler = Scheduler(simulation_clock)
 
 class Timer:
     def __init__(self, duration, function = None):
@@ -6,18 +56,29 @@ class Timer:
         self.function = function
         self.start_time = 0
         self.active = False
+        self.event = None
     
     def activate(self):
+        if self.event:
+            scheduler.cancel(self.event)
         self.active = True
-        self.start_time = pygame.time.get_ticks() 
+        self.start_time = simulation_clock.get_ticks()
+        self.event = scheduler.schedule(self.duration, self.expire)
         
     def deactivate(self):
+        if self.event:
+            scheduler.cancel(self.event)
+            self.event = None
         self.active = False
         self.start_time = 0
+
+    def expire(self):
+        self.event = None
+        if self.function:
+            self.function()
+        self.deactivate()
         
     def update(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.duration:
-            if self.function and self.start_time != 0:
-                self.function()
-            self.deactivate()
\ No newline at end of file
+        # The scheduler fires timers on its own, polling only catches one that is already due
+        if self.active and simulation_clock.get_ticks() - self.start_time >= self.duration:
+            self.expire()
\ No newline at end of file
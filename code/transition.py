@@ -1,5 +1,6 @@
 import pygame
 from settings import *
+from lighting import TintLayer
 
 class Transition:
     def __init__(self, reset, player):
@@ -10,11 +11,11 @@ class Transition:
         self.player = player
 
         # Overlay image
-        self.image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.tint = TintLayer()
         self.color = 255
         self.speed = -2
 
-    def play(self):
+    def update(self):
 
         self.color += self.speed
         if self.color <= 0:
@@ -26,5 +27,5 @@ class Transition:
             self.player.sleep = False
             self.speed = -2
 
-        self.image.fill((self.color, self.color, self.color))
-        self.display_surface.blit(self.image, (0, 0), special_flags = pygame.BLEND_RGBA_MULT)
\ No newline at end of file
+    def display(self):
+        self.tint.draw((self.color, self.color, self.color))
\ No newline at end of file
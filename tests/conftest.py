@@ -0,0 +1,21 @@
+import os, sys
+
+# Offscreen, no sound card needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# The game imports its modules flat and loads assets relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'code'))
+os.chdir(ROOT)
+
+import pygame
+import pytest
+from settings import *
+
+@pytest.fixture(scope = 'session', autouse = True)
+def display():
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    yield pygame.display.get_surface()
+    pygame.quit()
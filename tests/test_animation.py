@@ -0,0 +1,21 @@
+import animation
+from settings import *
+from animation import get_animation
+from support import AssetRegistry
+
+def test_evicted_frame_set_takes_its_animations_along(monkeypatch):
+    registry = AssetRegistry(max_frame_sets = 1)
+    monkeypatch.setattr(animation, 'assets', registry)
+
+    water = get_animation('./graphics/water', 5)
+    assert get_animation('./graphics/water', 5) is water
+    assert water.frames is registry.frames('./graphics/water')
+
+    # Only one frame set fits, so the corn frames push out the water and its animation
+    get_animation('./graphics/fruit/corn', loop = False)
+    assert len(registry.animations) == 1
+    assert all(played is not water for animations in registry.animations.values() for played in animations.values())
+
+    reloaded = get_animation('./graphics/water', 5)
+    assert reloaded is not water
+    assert reloaded.frames is registry.frames('./graphics/water')
@@ -0,0 +1,57 @@
+import pygame
+from settings import *
+from level import CameraGroup
+from sprites import Generic
+from random import Random
+
+def baseline_order(group, camera_rect):
+    # The draw order from before the render queue: every layer in turn, all sprites sorted by centery
+    return [
+        sprite
+        for layer in LAYERS.values()
+        for sprite in sorted(group.sprites(), key = lambda sprite: sprite.rect.centery)
+        if sprite.z == layer and sprite.rect.colliderect(camera_rect)]
+
+def drawn_order(group, sprites):
+    # Every sprite has its own surface, so the blits of the last frame name the sprites
+    by_surface = {sprite.image: sprite for sprite in sprites}
+    return [by_surface[surface] for surface, _ in group.last_frame[1] if surface in by_surface]
+
+def create_sprites(group, count, random):
+    sprites = []
+    for index in range(count):
+        # Coarse positions so many sprites share a centery and the insertion order breaks the tie
+        position = (random.randint(-20, 60) * 32, random.randint(-20, 40) * 32)
+        surface = pygame.Surface((random.choice([16, 32, 64]), random.choice([16, 32, 64])))
+        sprites.append(Generic(position, surface, group, random.choice(list(LAYERS.values()))))
+    return sprites
+
+def test_draw_order_matches_baseline():
+    group = CameraGroup()
+    random = Random(1)
+    sprites = create_sprites(group, 600, random)
+    player = sprites[0]
+
+    for frame in range(30):
+        group.custom_draw(player)
+        assert drawn_order(group, sprites) == baseline_order(group, group.camera_rect)
+
+        # Move a few sprites of every layer, change the layer of others and walk the camera
+        for sprite in random.sample(sprites[1:], 20):
+            sprite.rect.y += random.randint(-40, 40)
+        for sprite in random.sample(sprites[1:], 5):
+            sprite.z = random.choice(list(LAYERS.values()))
+        player.rect.x += 48
+
+def test_draw_order_after_removal_and_insertion():
+    group = CameraGroup()
+    random = Random(2)
+    sprites = create_sprites(group, 300, random)
+    player = sprites[0]
+    group.custom_draw(player)
+
+    for sprite in sprites[1::3]:
+        sprite.kill()
+    sprites += create_sprites(group, 100, random)
+    group.custom_draw(player)
+    assert drawn_order(group, sprites) == baseline_order(group, group.camera_rect)
@@ -0,0 +1,67 @@
+import hashlib
+import pygame
+import pytest
+import level as level_module
+from settings import *
+from controls import controls, GAME_KEYS
+from level import Level
+from rng import rng
+from timer import simulation_clock
+
+def mask(*keys):
+    return sum(1 << GAME_KEYS.index(key) for key in keys)
+
+# Run-length encoded [mask, steps] input: standing still, walking, using and switching tools, standing still again
+SCRIPT = [
+    [0, 60],
+    [mask(pygame.K_LEFT), 25], [0, 30],
+    [mask(pygame.K_SPACE), 1], [0, 40],
+    [mask(pygame.K_q), 1], [0, 10],
+    [mask(pygame.K_SPACE), 1], [0, 40],
+    [mask(pygame.K_DOWN), 15], [0, 20],
+    [mask(pygame.K_e), 1], [mask(pygame.K_LCTRL), 1], [0, 40],
+    [mask(pygame.K_UP, pygame.K_RIGHT), 20], [0, 60]]
+
+def render(dirty_rects, raining, monkeypatch):
+    # One fresh, seeded level per mode, so both draw the very same world
+    monkeypatch.setattr(level_module, 'DIRTY_RECTS', dirty_rects)
+    monkeypatch.setattr(controls, 'replay', None)
+    rng.seed(3)
+    simulation_clock.time = 0
+    level = Level()
+    level.music.stop()
+    level.raining = raining
+
+    # Tilled, watered and planted tiles around the player, so water, crops and apples are on screen
+    soil_layer = level.soil_layer
+    center = pygame.math.Vector2(level.player.rect.center)
+    for rect in sorted(soil_layer.hit_rects, key = lambda rect: center.distance_to(rect.center))[:30]:
+        soil_layer.get_hit(rect.center)
+        soil_layer.water(rect.center)
+        soil_layer.plant_seed(rect.center, 'corn')
+
+    controls.start_replay(SCRIPT)
+    screen = pygame.display.get_surface()
+    frames = []
+    partial = 0
+    while not controls.finished:
+        level.update(1 / SIMULATION_RATE)
+
+        # Alternate the interpolation, so sprites also land between two steps
+        rects = level.draw(0.5 if len(frames) % 2 else 1)
+        partial += rects is not None
+        frames.append(hashlib.md5(pygame.image.tobytes(screen, 'RGB')).hexdigest())
+    return frames, partial
+
+@pytest.mark.parametrize('raining', [False, True])
+def test_dirty_rects_match_full_redraw(raining, monkeypatch):
+    full_frames, full_partial = render(False, raining, monkeypatch)
+    dirty_frames, dirty_partial = render(True, raining, monkeypatch)
+
+    # Without the dirty path taken the comparison would prove nothing
+    assert full_partial == 0
+    assert dirty_partial > len(dirty_frames) // 2
+
+    assert len(dirty_frames) == len(full_frames)
+    mismatches = [frame for frame, (dirty, full) in enumerate(zip(dirty_frames, full_frames)) if dirty != full]
+    assert not mismatches, f'frames {mismatches[:10]} differ from a full redraw'
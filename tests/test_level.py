@@ -0,0 +1,24 @@
+import pytest
+from settings import *
+from level import Level
+from rng import rng
+
+@pytest.fixture(scope = 'module')
+def level():
+    rng.seed(1)
+    level = Level()
+    level.music.stop()
+    return level
+
+def test_open_shop_stops_interpolation(level):
+    player = level.player
+    all_sprites = level.all_sprites
+
+    # As if the last step before the shop opened moved the player
+    all_sprites.previous_positions[player] = (player.rect.x - 100, player.rect.y)
+    level.shop_active = True
+    level.update(1 / SIMULATION_RATE)
+    level.shop_active = False
+
+    assert player not in all_sprites.previous_positions
+    assert all_sprites.interpolate(player, 0.5) == player.rect.topleft
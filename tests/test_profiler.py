@@ -0,0 +1,13 @@
+from settings import *
+from profiler import Profiler
+
+def test_histogram_bins_frame_times():
+    profiler = Profiler()
+    profiler.frame_times.extend(milliseconds / 1000 for milliseconds in (1, 3.9, 4, 16.6, 16.7, 40, 500))
+    counts = profiler.histogram()
+
+    assert len(counts) == len(PROFILER_HISTOGRAM_BINS) + 1
+    assert sum(counts) == 7
+    assert counts[0] == 2
+    assert counts[1] == 1
+    assert counts[-1] == 2
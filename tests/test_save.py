@@ -0,0 +1,30 @@
+import pytest
+import level as level_module
+from settings import *
+from level import Level
+from rng import rng
+from save import Autosaver
+
+def test_failed_autosave_keeps_the_game_running(tmp_path, monkeypatch, capsys):
+    # A file where the save folder should be, so every background write fails
+    (tmp_path / 'notadir').write_text('')
+    save_path = str(tmp_path / 'notadir' / 'farm.sav')
+    autosaver = Autosaver()
+    monkeypatch.setattr(level_module, 'autosaver', autosaver)
+    rng.seed(1)
+    level = Level(save_path = save_path)
+    level.music.stop()
+
+    # Two rollovers, the second one comes after the first write has failed
+    level.reset()
+    autosaver.future.exception()
+    level.reset()
+    autosaver.shutdown()
+
+    assert autosaver.saved == 2
+    assert autosaver.failed == 2
+    assert capsys.readouterr().out.count(f'could not save {save_path}') == 2
+
+    # Only a caller asking for the result gets the error
+    with pytest.raises(OSError):
+        autosaver.wait()
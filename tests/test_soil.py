@@ -0,0 +1,70 @@
+import pygame
+import pytest
+import numpy as np
+from settings import *
+from mapgen import generate_map
+from soil import SoilLayer, SoilTile, TILLED, WATERED
+from sprites import CollisionGroup
+
+@pytest.fixture(scope = 'module')
+def map_path():
+    # A small farm, mostly farmland
+    return generate_map('./data/generated/soil_test.tmx', 12, 12, {'farmable': 0.5}, seed = 1)
+
+@pytest.fixture
+def soil_layer(map_path):
+    soil_layer = SoilLayer(pygame.sprite.Group(), CollisionGroup(), map_path)
+    soil_layer.raining = False
+    return soil_layer
+
+def test_watering_twice_waters_one_tile(soil_layer):
+    position = soil_layer.hit_rects[0].center
+    soil_layer.get_hit(position)
+    soil_layer.water(position)
+    soil_layer.water(position)
+
+    x, y = soil_layer.get_tile(position)
+    assert np.count_nonzero(soil_layer.grid & WATERED) == 1
+    assert soil_layer.has_flag(x, y, WATERED)
+
+    # One puddle is drawn and the soil tile is the only sprite
+    blits = soil_layer.water_layer.blits(pygame.Rect(0, 0, 12 * TILE_SIZE, 12 * TILE_SIZE))
+    assert [position for _, position in blits] == [(x * TILE_SIZE, y * TILE_SIZE)]
+    assert len(soil_layer.all_sprites) == 1
+
+def test_rain_and_rollover_create_no_sprites(soil_layer):
+    for rect in soil_layer.hit_rects:
+        soil_layer.get_hit(rect.center)
+    sprites = len(soil_layer.all_sprites)
+
+    soil_layer.water_all()
+    assert np.array_equal(soil_layer.grid & WATERED != 0, soil_layer.grid & TILLED != 0)
+    assert len(soil_layer.water_layer.blits(pygame.Rect(0, 0, 12 * TILE_SIZE, 12 * TILE_SIZE))) == len(soil_layer.soil_tiles)
+    soil_layer.remove_water()
+    assert not np.any(soil_layer.grid & WATERED)
+    assert len(soil_layer.all_sprites) == sprites
+
+def test_hoeing_keeps_sprite_count_bounded(soil_layer):
+    all_sprites = soil_layer.all_sprites
+    positions = [rect.center for rect in soil_layer.hit_rects[:10]]
+    neighbours = [(x + offset_x, y + offset_y) for x, y in positions for offset_x, offset_y in ((TILE_SIZE, 0), (-TILE_SIZE, 0), (0, TILE_SIZE), (0, -TILE_SIZE))]
+    seen = set()
+
+    for round in range(300):
+        for position in positions + neighbours:
+            soil_layer.get_hit(position)
+        if round % 50 == 0:
+            # A full rebuild replaces every tile
+            soil_layer.create_soil_tiles()
+        seen.update(sprite for sprite in all_sprites if isinstance(sprite, SoilTile))
+
+        # Nothing but soil is in all_sprites here, so the constant is zero
+        tilled = int((soil_layer.grid & TILLED).astype(bool).sum())
+        assert len(all_sprites) == tilled
+        assert len(soil_layer.soil_sprites) == tilled == len(soil_layer.soil_tiles)
+
+    # Replaced tiles are gone from every group, not only from soil_sprites
+    current = set(soil_layer.soil_tiles.values())
+    for sprite in seen - current:
+        assert not sprite.alive()
+    assert seen - current
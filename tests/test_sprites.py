@@ -0,0 +1,19 @@
+import pygame
+import pytest
+from settings import *
+from sprites import CollisionGroup, InteractionGroup, Generic
+
+@pytest.mark.parametrize('group_class', [CollisionGroup, InteractionGroup])
+def test_sprite_killed_after_refresh_leaves_the_index(group_class):
+    group = group_class()
+    area = pygame.Rect(0, 0, 10 * TILE_SIZE, 10 * TILE_SIZE)
+    sprite = Generic((TILE_SIZE, TILE_SIZE), pygame.Surface((TILE_SIZE, TILE_SIZE)), group)
+    other = Generic((3 * TILE_SIZE, TILE_SIZE), pygame.Surface((TILE_SIZE, TILE_SIZE)), group)
+
+    # Refreshed before the group was queried, then gone in the same step, like a crop harvested as it appears
+    group.refresh(sprite)
+    sprite.kill()
+
+    assert group.query(area) == [other]
+    assert group.colliding(area) == [other]
+    assert not group.new_sprites
@@ -0,0 +1,37 @@
+import os
+import pytest
+import tilemap
+from mapgen import generate_map
+from tilemap import load_map, cache_paths
+
+@pytest.fixture(autouse = True)
+def cache_folder(tmp_path, monkeypatch):
+    # Caches of the throwaway maps stay out of data/cache
+    monkeypatch.setattr(tilemap, 'CACHE_FOLDER', str(tmp_path / 'cache'))
+    yield
+    tilemap.maps.clear()
+
+def test_maps_with_the_same_name_get_their_own_cache(tmp_path):
+    first = generate_map(str(tmp_path / 'a' / 'map.tmx'), 10, 8, seed = 1)
+    second = generate_map(str(tmp_path / 'b' / 'map.tmx'), 14, 12, seed = 2)
+    os.utime(second, (os.path.getmtime(first),) * 2)
+    assert cache_paths(first) != cache_paths(second)
+
+    for _ in range(2):
+        # Once cold, once warm from the cache files
+        tilemap.maps.clear()
+        assert (load_map(first).width, load_map(first).height) == (10, 8)
+        assert (load_map(second).width, load_map(second).height) == (14, 12)
+
+def test_corrupt_cache_is_rebuilt(tmp_path):
+    path = generate_map(str(tmp_path / 'corrupt.tmx'), 10, 8, seed = 1)
+    load_map(path)
+    cache_path = cache_paths(path)[0]
+    with open(cache_path, 'rb') as file:
+        data = file.read()
+
+    for broken in (data[:len(data) // 2], b'', b'not a pickle'):
+        with open(cache_path, 'wb') as file:
+            file.write(broken)
+        tilemap.maps.clear()
+        assert load_map(path).width == 10